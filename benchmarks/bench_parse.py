@@ -0,0 +1,72 @@
+"""
+網頁解析基準測試：用 fixtures/ 裡的網頁，比較原本的整頁解析與目前的解析方式。
+量測每頁的解析時間（毫秒）與記憶體峰值（KB，tracemalloc）。
+
+用法：
+    python benchmarks/bench_parse.py [--repeat 50]
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+from veggie_parse import parse_price_cards, parse_first_search_link, html_parser_name  # noqa: E402
+
+
+def before_price_cards(html: str):
+    """原本的作法：html.parser 解析整頁後再找 vege_price 區塊。"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, "html.parser").find_all("div", class_="vege_price")
+
+
+def before_search_link(html: str):
+    """原本的作法：html.parser 解析整頁後再用 CSS 選擇器找第一個連結。"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, "html.parser").select_one("div.blog-posts a")
+
+
+CASES = [
+    ("vege.html", "整頁 html.parser", before_price_cards),
+    ("vege.html", f"SoupStrainer + {html_parser_name()}", parse_price_cards),
+    ("fruit.html", "整頁 html.parser", before_price_cards),
+    ("fruit.html", f"SoupStrainer + {html_parser_name()}", parse_price_cards),
+    ("search.html", "整頁 html.parser", before_search_link),
+    ("search.html", "串流解析（找到即停止）", parse_first_search_link),
+]
+
+
+def measure(func, html: str, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_ms": statistics.median(samples), "peak_kb": peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測網頁解析時間與記憶體。")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'網頁':<12} {'解析方式':<28} {'時間(ms)':>10} {'記憶體峰值(KB)':>14}")
+    for fixture, label, func in CASES:
+        html = (FIXTURES / fixture).read_text(encoding="utf-8")
+        result = measure(func, html, args.repeat)
+        print(f"{fixture:<12} {label:<28} {result['median_ms']:>10.2f} {result['peak_kb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
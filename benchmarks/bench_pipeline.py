@@ -0,0 +1,199 @@
+"""
+爬蟲 → 查詢 → 寄信 整條流程的基準測試：對本機假網站（fake_twfood.py）與本機 SMTP 收信器執行，
+不需要網路，每次結果可重現。
+
+量測項目：
+    scrape_tw_food_top5            爬取一個推薦排行榜分頁
+    apply_url_dataframe            爬取蔬菜與水果排行榜並建立 DataFrame
+    search x N / search_many[N]    關注 N 種水果（1、10、100）時逐一查詢與批次查詢，分成冷快取（第一次）與熱快取
+    task                           veggie_w4_schedule.task() 整個排程（查詢、比對規則、寄信；warm 為交易週沒變的情況）
+
+程式碼會先複製到暫存資料夾再執行，快取、資料庫與寄件匣都不會動到專案資料夾。
+結果存成 JSON，可用 --compare 與之前的結果比較，中位數變慢超過 --threshold 時以結束代碼 1 結束。
+
+用法：
+    python benchmarks/bench_pipeline.py [--repeat 5] [--latency 20] [--output results.json]
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/pipeline-20260101-120000.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_twfood import FakeTwfoodServer, SmtpSink  # noqa: E402
+
+
+def fruit_names(prefix: str, count: int) -> list[str]:
+    return [f"{prefix}{i:03d}" for i in range(count)]
+
+
+def measure(func, repeat: int) -> dict:
+    """執行 repeat 次，回傳毫秒的中位數、最小值與最大值。"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 2),
+        "min_ms": round(min(samples), 2),
+        "max_ms": round(max(samples), 2),
+        "samples": len(samples),
+    }
+
+
+def prepare_workdir(workdir: Path, server: FakeTwfoodServer, sink: SmtpSink):
+    """把程式碼複製到暫存資料夾，並把網站與 SMTP 設定指向本機的假伺服器。"""
+    for path in ROOT.glob("*.py"):
+        shutil.copy2(path, workdir / path.name)
+    sys.path.insert(0, str(workdir))
+
+    os.environ.update({
+        "VEGGIE_HTTP_MODE": "live",
+        "VEGGIE_BASE_URL": server.base_url,
+        "VEGGIE_SMTP_HOST": "127.0.0.1",
+        "VEGGIE_SMTP_PORT": str(sink.port),
+        "VEGGIE_SMTP_STARTTLS": "0",
+        "VEGGIE_SMTP_RATE": "0",
+        "VEGGIE_METRICS_DIR": str(workdir / "metrics"),
+    })
+
+
+def write_subscribers(path: Path, subscribers: int, fruits_per_subscriber: int, pool: list[str]):
+    """產生訂閱清單：每位訂閱者關注 pool 中連續的幾種水果。"""
+    entries = [
+        {
+            "email": f"user{i:03d}@example.com",
+            "fruits": [pool[(i + j) % len(pool)] for j in range(fruits_per_subscriber)],
+            "rules": [],
+        }
+        for i in range(subscribers)
+    ]
+    path.write_text(json.dumps({"subscribers": entries}, ensure_ascii=False), encoding="utf-8")
+
+
+def run_benchmarks(workdir: Path, sizes: list[int], repeat: int, browser: bool, sink: SmtpSink) -> dict:
+    import veggie_w1
+    import veggie_w3
+    import veggie_w4_schedule
+    from veggie_http import site_url
+
+    results = {}
+
+    def record(name: str, func, times: int):
+        results[name] = measure(func, times)
+        print(f"{name:<32} {results[name]['median_ms']:>10.1f} {results[name]['min_ms']:>10.1f}")
+
+    print(f"{'項目':<30} {'中位數(ms)':>10} {'最小值(ms)':>10}")
+    record("scrape_tw_food_top5", lambda: veggie_w1.scrape_tw_food_top5(site_url("/vege")), repeat)
+    record("apply_url_dataframe", veggie_w1.apply_url_dataframe, repeat)
+
+    for size in sizes:
+        # 每個項目用不同的水果名稱，第一次執行一定是冷快取。
+        names = fruit_names(f"逐一{size}-", size)
+        search_all = lambda: [veggie_w3.search(name, verify_with_browser=browser) for name in names]
+        record(f"search x {size} (cold)", search_all, 1)
+        record(f"search x {size} (warm)", search_all, repeat)
+
+        names = fruit_names(f"批次{size}-", size)
+        search_batch = lambda: veggie_w3.search_many(names, verify_with_browser=browser)
+        record(f"search_many[{size}] (cold)", search_batch, 1)
+        record(f"search_many[{size}] (warm)", search_batch, repeat)
+
+    # 排程：50 位訂閱者、每人 5 種水果（共 30 種），寄信到本機收信器。
+    veggie_w4_schedule.FROM_EMAIL = "bench@example.com"
+    write_subscribers(workdir / "fruit_list.json", 50, 5, fruit_names("排程-", 30))
+    record("task (cold)", veggie_w4_schedule.task, 1)
+    # 交易週沒變時排程只做新鮮度檢查；force=True 量測完整的查詢與比對（同一週期不重複寄信）。
+    record("task (warm)", veggie_w4_schedule.task, repeat)
+    record("task (force)", lambda: veggie_w4_schedule.task(force=True), repeat)
+    print(f"收信器共收到 {len(sink.received)} 封信")
+    return results
+
+
+def git_revision() -> str:
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return proc.stdout.strip() if proc.returncode == 0 else ""
+
+
+def compare(current: dict, baseline_path: Path, threshold: float) -> bool:
+    """與之前的結果比較中位數，回傳是否有項目變慢超過 threshold（例如 0.2 代表 20%）。"""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regressed = False
+    print(f"\n與 {baseline_path.name}（{baseline['meta'].get('revision', '')}）比較：")
+    print(f"{'項目':<30} {'之前(ms)':>10} {'現在(ms)':>10} {'變化':>8}")
+    for name, result in current["results"].items():
+        if not (before := baseline["results"].get(name)):
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        flag = " ⚠️" if change > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"{name:<32} {before['median_ms']:>10.1f} {result['median_ms']:>10.1f} {change:>+8.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="對本機假網站量測爬蟲、查詢與寄信流程。")
+    parser.add_argument("--repeat", type=int, default=5, help="熱快取項目的重複次數")
+    parser.add_argument("--latency", type=float, default=20, help="假網站每個請求的延遲（毫秒）")
+    parser.add_argument("--sizes", default="1,10,100", help="關注的水果數量，以逗號分隔")
+    parser.add_argument("--browser", action="store_true", help="查詢時以 Selenium 比對全年度平均成交價（需安裝 Chrome）")
+    parser.add_argument("--output", type=Path, help="結果 JSON 檔案（預設存到 benchmarks/results/）")
+    parser.add_argument("--compare", type=Path, help="要比較的之前結果 JSON 檔案")
+    parser.add_argument("--threshold", type=float, default=0.2, help="中位數變慢超過此比例視為退步")
+    args = parser.parse_args()
+
+    # 只顯示錯誤，避免排程的執行紀錄洗版。
+    logging.basicConfig(level=logging.ERROR)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    server = FakeTwfoodServer(latency=args.latency / 1000).start()
+    sink = SmtpSink().start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            workdir = Path(tmp)
+            prepare_workdir(workdir, server, sink)
+            results = run_benchmarks(workdir, sizes, args.repeat, args.browser, sink)
+    finally:
+        server.stop()
+        sink.stop()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "latency_ms": args.latency,
+            "browser": args.browser,
+        },
+        "server": {"requests": server.requests, "bytes_sent": server.bytes_sent, "mails": len(sink.received)},
+        "results": results,
+    }
+
+    output = args.output or RESULTS_DIR / f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n結果已存到 {output}")
+
+    if args.compare and compare(report, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+啟動時間基準測試：在全新的 Python 直譯器中 import 各模組，量測所需時間。
+
+用法：
+    python benchmarks/bench_startup.py                 # 量測目前的程式碼
+    python benchmarks/bench_startup.py --baseline HEAD~1  # 同時量測指定 git 版本，方便比較
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ("veggie_w1", "veggie_w3", "veggie_w4_schedule")
+
+
+def time_import(module: str, cwd: Path, repeat: int) -> dict:
+    """在 cwd 下重複以全新直譯器 import module，回傳中位數與最小值（毫秒）。"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", f"import {module}"],
+            cwd=cwd,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        samples.append(elapsed)
+    return {"median_ms": round(statistics.median(samples), 1), "min_ms": round(min(samples), 1)}
+
+
+def export_revision(revision: str, target: Path):
+    """把指定 git 版本的檔案匯出到 target 資料夾。"""
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", revision],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+    )
+    subprocess.run(["tar", "-x", "-C", str(target)], input=archive.stdout, check=True)
+
+
+def run(cwd: Path, repeat: int) -> dict:
+    # 先量一次空的直譯器，作為比較基準。
+    results = {"(python)": time_import("sys", cwd, repeat)}
+    for module in MODULES:
+        results[module] = time_import(module, cwd, repeat)
+    return results
+
+
+def print_results(title: str, results: dict):
+    print(title)
+    for module, result in results.items():
+        if "error" in result:
+            print(f"  {module:<20} 失敗：{result['error']}")
+        else:
+            print(f"  {module:<20} 中位數 {result['median_ms']:>8.1f} ms   最小 {result['min_ms']:>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測模組 import 時間。")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", help="要比較的 git 版本（例如 HEAD~1）")
+    args = parser.parse_args()
+
+    print_results("目前版本：", run(ROOT, args.repeat))
+
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_revision(args.baseline, Path(tmp))
+            print_results(f"\n{args.baseline}：", run(Path(tmp), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
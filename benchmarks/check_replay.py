@@ -0,0 +1,105 @@
+"""
+錄製 → 重播 → 重播 的一致性檢查：對本機假網站（fake_twfood.py）以 VEGGIE_HTTP_MODE=record 查詢一次，
+關掉假網站後以 replay 模式重複查詢兩次，三次的結果必須完全相同。
+重播時會先查詢幾個沒有錄製的水果，確認找不到錄製檔不會讓斷路器擋下之後有錄製的網址。
+
+每次查詢都在獨立的子程式中執行；錄製檔存在暫存資料夾，不會動到專案的 replay_fixtures/、快取與資料庫。
+結果不一致時以結束代碼 1 結束。
+
+用法：
+    python benchmarks/check_replay.py [--fruits 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_twfood import FakeTwfoodServer  # noqa: E402
+
+
+def run_child(names: list[str]):
+    """子程式：查詢 names 並把結果以 JSON 印出（不含耗時）。"""
+    sys.path.insert(0, str(ROOT))
+    import veggie_w3
+
+    results = [veggie_w3.search(name) for name in names]
+    results += veggie_w3.search_many(names)
+    print(json.dumps(
+        [{"fruit": r.fruit, "message": r.message, "data": r.data and asdict(r.data)} for r in results],
+        ensure_ascii=False,
+    ))
+
+
+def run_mode(mode: str, names: list[str], env: dict) -> list[dict]:
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", json.dumps(names, ensure_ascii=False)],
+        env={**env, "VEGGIE_HTTP_MODE": mode}, capture_output=True, text=True, cwd=ROOT,
+    )
+    if proc.returncode != 0:
+        sys.exit(f"{mode} 執行失敗：\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="檢查錄製後的重播結果是否與錄製時相同。")
+    parser.add_argument("--fruits", type=int, default=10, help="查詢的水果數量")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return
+
+    names = [f"重播{i:03d}" for i in range(args.fruits)]
+    # 斷路器連續失敗 5 次就會打開，沒有錄製的水果要多於這個次數。
+    missing = [f"未錄製{i:03d}" for i in range(6)]
+
+    server = FakeTwfoodServer().start()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "VEGGIE_BASE_URL": server.base_url,
+            "VEGGIE_REPLAY_DIR": str(Path(tmp) / "fixtures"),
+            "VEGGIE_METRICS_DIR": str(Path(tmp) / "metrics"),
+        }
+        try:
+            recorded = run_mode("record", names, env)
+        finally:
+            # 重播時假網站已經關閉，確認完全沒有連線。
+            server.stop()
+        replays = [run_mode("replay", missing + names, env) for _ in range(2)]
+
+    failed = False
+    for i, replayed in enumerate(replays, 1):
+        # 子程式先逐一查詢再批次查詢，兩段都以 missing 開頭。
+        half = len(replayed) // 2
+        misses = replayed[:len(missing)] + replayed[half:half + len(missing)]
+        hits = replayed[len(missing):half] + replayed[half + len(missing):]
+        if hits != recorded:
+            failed = True
+            for before, after in zip(recorded, hits):
+                if before != after:
+                    print(f"第 {i} 次重播與錄製不同：{before} != {after}")
+        if any(miss["data"] for miss in misses):
+            failed = True
+            print(f"第 {i} 次重播中沒有錄製的水果卻查到資料")
+    if replays[0] != replays[1]:
+        failed = True
+        print("兩次重播的結果不同")
+
+    ok = sum(1 for result in recorded if result["data"])
+    print(f"錄製 {len(recorded)} 筆（{ok} 筆有資料），重播 2 次：{'不一致' if failed else '一致'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+基準測試用的本機假網站與 SMTP 收信器，不需要連上 twfood.cc 或真正的郵件伺服器。
+
+假網站提供：
+    /vege、/fruit                 fixtures/ 裡的推薦排行榜網頁
+    /search?q=名稱                 搜尋結果（任何名稱都找得到，代碼由名稱決定）
+    /api/FarmTradeSumWeeks         每週成交價（支援 where 的 itemCode / inq、endDay 的 gt / gte，以及 order、limit、fields）
+    /fruit/代碼/名稱               含「全年度平均成交價」圖表文字的水果頁面
+每週成交價由代碼決定，每次執行結果都相同。
+"""
+import json
+import math
+import socketserver
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+# 每個代碼提供的歷史週數。
+HISTORY_WEEKS = 60
+
+
+def fruit_code(name: str) -> str:
+    """假網站上的水果代碼：由名稱決定。"""
+    return f"Z{zlib.crc32(name.encode('utf-8')) % 100000:05d}"
+
+
+def weekly_prices(code: str, weeks: int = HISTORY_WEEKS) -> list[dict]:
+    """某個代碼的每週成交價（由新到舊），價格在基準價上下波動，約一半的水果最新一週低於年均。"""
+    seed = zlib.crc32(code.encode("utf-8"))
+    base = 20 + seed % 60
+    phase = (seed >> 8) % 628 / 100
+    # 週期以最近的週五結束。
+    latest = date.today() - timedelta(days=(date.today().weekday() - 4) % 7)
+    return [
+        {
+            "itemCode": code,
+            "endDay": (latest - timedelta(weeks=i)).strftime("%Y/%m/%d"),
+            "startDay": (latest - timedelta(weeks=i, days=6)).strftime("%Y/%m/%d"),
+            "avgPrice": round(base * (1 + 0.2 * math.sin(i / 4 + phase)), 1),
+        }
+        for i in range(weeks)
+    ]
+
+
+def _match(value, condition) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    checks = {
+        "inq": lambda target: value in target,
+        "gt": lambda target: value > target,
+        "gte": lambda target: value >= target,
+        "lt": lambda target: value < target,
+        "lte": lambda target: value <= target,
+    }
+    return all(checks[op](target) for op, target in condition.items())
+
+
+def query_weeks(query: dict) -> list[dict]:
+    """依 LoopBack 風格的 filter 篩選每週成交價。"""
+    where = query.get("where", {})
+    codes = where.get("itemCode")
+    codes = codes["inq"] if isinstance(codes, dict) else [codes]
+
+    rows = [
+        row
+        for code in codes
+        for row in weekly_prices(code)
+        if all(_match(row[field], condition) for field, condition in where.items() if field != "itemCode")
+    ]
+    field, _, direction = query.get("order", "endDay desc").partition(" ")
+    rows.sort(key=lambda row: row[field], reverse=direction.lower() == "desc")
+    if limit := query.get("limit"):
+        rows = rows[:limit]
+    if fields := [name for name, wanted in query.get("fields", {}).items() if wanted]:
+        rows = [{name: row[name] for name in fields} for row in rows]
+    return rows
+
+
+SEARCH_PAGE = """<!DOCTYPE html>
+<html lang="zh-Hant"><head><meta charset="utf-8"><title>搜尋 - 當季好蔬果</title></head>
+<body><div class="container"><div class="blog-posts">
+<div class="post"><a href="{href}" title="{name}">{name}</a></div>
+</div></div></body></html>
+"""
+
+CHART_PAGE = """<!DOCTYPE html>
+<html lang="zh-Hant"><head><meta charset="utf-8"><title>{name} - 當季好蔬果</title></head>
+<body><svg width="600" height="300"><text x="10" y="20"><tspan>全年度平均成交價 NT$ {price}</tspan></text></svg></body></html>
+"""
+
+
+class FakeTwfoodHandler(BaseHTTPRequestHandler):
+    server: "FakeTwfoodServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        if parts.path in ("/vege", "/fruit"):
+            self._send((FIXTURES / f"{parts.path[1:]}.html").read_bytes(), "text/html; charset=utf-8")
+        elif parts.path == "/search":
+            name = query.get("q", [""])[0]
+            href = f"/fruit/{fruit_code(name)}/{quote(name)}"
+            self._send(SEARCH_PAGE.format(href=href, name=name).encode("utf-8"), "text/html; charset=utf-8")
+        elif parts.path == "/api/FarmTradeSumWeeks":
+            rows = query_weeks(json.loads(query.get("filter", ["{}"])[0]))
+            self._send(json.dumps(rows).encode("utf-8"), "application/json; charset=utf-8")
+        elif parts.path.startswith("/fruit/"):
+            code, _, name = parts.path[len("/fruit/"):].partition("/")
+            prices = [row["avgPrice"] for row in weekly_prices(code, 52)]
+            page = CHART_PAGE.format(name=unquote(name), price=round(sum(prices) / len(prices), 2))
+            self._send(page.encode("utf-8"), "text/html; charset=utf-8")
+        else:
+            self._send(b"not found", "text/plain", status=404)
+
+    def _send(self, body: bytes, content_type: str, status: int = 200):
+        # 先計數再回應，呼叫端收到回應時計數已經更新。
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes_sent += len(body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeTwfoodServer(ThreadingHTTPServer):
+    """假網站；latency 為每個請求額外等待的秒數，模擬網路延遲。"""
+
+    daemon_threads = True
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), FakeTwfoodHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeTwfoodServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    """最簡單的 SMTP 對話：接受所有指令，只記錄收到的信。"""
+
+    def handle(self):
+        self.wfile.write(b"220 sink ESMTP\r\n")
+        in_data, lines = False, []
+        while line := self.rfile.readline():
+            if in_data:
+                if line == b".\r\n":
+                    self.server.received.append(b"".join(lines))
+                    in_data, lines = False, []
+                    self.wfile.write(b"250 OK\r\n")
+                else:
+                    lines.append(line)
+                continue
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.wfile.write(b"250 sink\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """本機 SMTP 收信器：收到的信存在 received。"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpSinkHandler)
+        self.received: list[bytes] = []
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "SmtpSink":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,151 @@
+import os
+import atexit
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from selenium import webdriver # 用來控制瀏覽器自動化操作。
+from selenium.common.exceptions import WebDriverException
+
+
+# 輕量化頁面設定：不載入圖片、字型與 CSS，只等 DOM 可用（eager）就開始找元素。
+BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.css",
+]
+
+
+def build_driver() -> webdriver.Chrome:
+    """建立一個輕量化的無頭瀏覽器。"""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    # 2 代表封鎖：圖片與字型都不下載。
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+    })
+    # eager：DOMContentLoaded 後就回傳，不等所有資源下載完成。
+    options.page_load_strategy = "eager"
+
+    driver = webdriver.Chrome(options=options)
+    try:
+        # 透過 DevTools 封鎖 CSS、字型與圖片請求。
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    except WebDriverException:
+        pass
+    return driver
+
+
+def is_alive(driver) -> bool:
+    """健康檢查：瀏覽器還能執行 JavaScript 才算可用。"""
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+
+def quit_driver(driver):
+    """關閉瀏覽器，忽略已經壞掉的連線。"""
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+class BrowserPool:
+    """
+    長駐的無頭瀏覽器池：同一個程式內的所有查詢共用，避免每次都重新啟動 Chrome。
+    size：最多同時開幾個瀏覽器；max_pages：每個瀏覽器開過幾個頁面後就回收重開。
+    """
+
+    def __init__(self, size: int = 2, max_pages: int = 50):
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self._idle = queue.LifoQueue()
+        self._pages = {}
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout: Optional[float]):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = None
+                with self._lock:
+                    if self._closed:
+                        raise RuntimeError("BrowserPool is closed")
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        driver = build_driver()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    self._pages[id(driver)] = 0
+                    return driver
+                # 已達上限，等其他查詢歸還。
+                driver = self._idle.get(timeout=timeout)
+
+            if is_alive(driver):
+                return driver
+            self._discard(driver)
+
+    def _discard(self, driver):
+        self._pages.pop(id(driver), None)
+        quit_driver(driver)
+        with self._lock:
+            self._created -= 1
+
+    def _release(self, driver):
+        self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+        # 開過太多頁面或已失效就回收，避免記憶體持續累積。
+        if self._closed or self._pages[id(driver)] >= self.max_pages or not is_alive(driver):
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None):
+        """借用一個瀏覽器，離開 with 區塊時自動歸還。"""
+        driver = self._acquire(timeout)
+        try:
+            yield driver
+        finally:
+            self._release(driver)
+
+    def close(self):
+        """關閉池內所有閒置的瀏覽器；借出中的瀏覽器歸還時也會關閉。"""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """取得程式共用的瀏覽器池，大小可用環境變數 VEGGIE_BROWSER_POOL_SIZE、VEGGIE_BROWSER_MAX_PAGES 設定。"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                size=int(os.environ.get("VEGGIE_BROWSER_POOL_SIZE", 2)),
+                max_pages=int(os.environ.get("VEGGIE_BROWSER_MAX_PAGES", 50)),
+            )
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,216 @@
+import os
+import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Optional
+from veggie_files import write_json_atomic, file_lock # 先寫暫存檔再取代的 JSON 寫入與跨程式的檔案鎖。
+
+
+# 快取檔案與 fruit_list.json 放在同一個資料夾。
+DEFAULT_CODE_CACHE_FILE = Path(__file__).parent / "fruit_code_cache.json"
+DEFAULT_FAILURE_CACHE_FILE = Path(__file__).parent / "fruit_failure_cache.json"
+
+
+class JsonTTLCache:
+    """
+    以水果名稱為鍵的硬碟快取（JSON 檔）：每筆資料記錄寫入時間 saved_at，超過 ttl 秒視為過期。
+    子類別決定每筆資料存哪些欄位，以及各自的保存秒數（_entry_ttl）。
+    檔案被其他程式改過（例如網頁的「立即更新資料」清除快取）時，下次讀寫前會重新載入。
+    """
+
+    def __init__(self, path: Path, ttl: float):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = self._load()
+
+    def _file_version(self) -> Optional[tuple]:
+        """檔案的修改時間與大小，檔案不存在時為 None。"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> dict:
+        self._version = self._file_version()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _reload_if_changed(self):
+        """檔案被其他程式改過就重新載入（呼叫端需持有 self._lock）。"""
+        if self._file_version() != self._version:
+            self._entries = self._load()
+
+    def _save(self):
+        write_json_atomic(self.path, self._entries)
+        self._version = self._file_version()
+
+    def _entry_ttl(self, entry: dict) -> float:
+        """這筆資料的保存秒數。"""
+        return self.ttl
+
+    def _get_entry(self, fruit_name: str) -> Optional[dict]:
+        """取得沒有過期的資料，沒有或已過期回傳 None。"""
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._entries.get(fruit_name)
+        if not entry or time.time() - entry.get("saved_at", 0) > self._entry_ttl(entry):
+            return None
+        return entry
+
+    def _put_entry(self, fruit_name: str, **fields):
+        """寫入一筆資料（自動加上寫入時間）並存檔。"""
+        # 檔案鎖：其他程式不會在「重新載入 → 寫回」之間寫入，不會蓋掉對方的修改。
+        with self._lock, file_lock(self.path):
+            self._reload_if_changed()
+            self._entries[fruit_name] = {**fields, "saved_at": time.time()}
+            self._save()
+
+    def invalidate(self, fruit_name: Optional[str] = None):
+        """清除指定水果的快取；不指定則全部清除。"""
+        with self._lock, file_lock(self.path):
+            self._reload_if_changed()
+            if fruit_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(fruit_name, None)
+            self._save()
+
+
+class FruitCodeCache(JsonTTLCache):
+    """
+    水果名稱 → 水果代碼、網址 的硬碟快取（JSON 檔）。
+    找得到的名稱保存 ttl 秒；找不到的名稱也會記錄（負快取），保存 negative_ttl 秒。
+    """
+
+    def __init__(
+            self,
+            path: Path = DEFAULT_CODE_CACHE_FILE,
+            ttl: float = 30 * 24 * 3600,
+            negative_ttl: float = 24 * 3600,
+        ):
+        self.negative_ttl = negative_ttl
+        super().__init__(path, ttl)
+
+    def _entry_ttl(self, entry: dict) -> float:
+        return self.ttl if entry.get("code") else self.negative_ttl
+
+    def get(self, fruit_name: str) -> Optional[dict]:
+        """
+        查詢快取。沒有或已過期回傳 None；
+        有資料回傳 {"code": ..., "href": ...}，負快取的 code 與 href 為 None。
+        """
+        if not (entry := self._get_entry(fruit_name)):
+            return None
+        return {"code": entry.get("code"), "href": entry.get("href")}
+
+    def set(self, fruit_name: str, code: str, href: str):
+        """記錄找到的水果代碼與網址。"""
+        self._put_entry(fruit_name, code=code, href=href)
+
+    def set_missing(self, fruit_name: str):
+        """記錄找不到的水果名稱（負快取）。"""
+        self._put_entry(fruit_name, code=None, href=None)
+
+
+class FailureCache(JsonTTLCache):
+    """
+    查詢失敗的短期負快取（JSON 檔）：例如找不到元素、沒有成交資料等非連線問題，
+    ttl 秒內同一個水果直接回傳上次的錯誤，不再連線查詢。
+    """
+
+    def __init__(self, path: Path = DEFAULT_FAILURE_CACHE_FILE, ttl: float = 3600):
+        super().__init__(path, ttl)
+
+    def get(self, fruit_name: str) -> Optional[str]:
+        """回傳快取中的錯誤訊息，沒有或已過期回傳 None。"""
+        entry = self._get_entry(fruit_name)
+        return entry.get("message") if entry else None
+
+    def set(self, fruit_name: str, message: str):
+        """記錄查詢失敗的錯誤訊息。"""
+        self._put_entry(fruit_name, message=message)
+
+
+_code_cache: Optional[FruitCodeCache] = None
+_code_cache_lock = threading.Lock()
+
+
+def get_code_cache() -> FruitCodeCache:
+    """取得程式共用的水果代碼快取。"""
+    global _code_cache
+    with _code_cache_lock:
+        if _code_cache is None:
+            # 錄製／重播模式使用暫存的快取檔（見 veggie_replay.state_path）。
+            from veggie_replay import state_path
+            _code_cache = FruitCodeCache(state_path(DEFAULT_CODE_CACHE_FILE))
+        return _code_cache
+
+
+_failure_cache: Optional[FailureCache] = None
+
+
+def get_failure_cache() -> FailureCache:
+    """取得程式共用的查詢失敗負快取，保存秒數可用環境變數 VEGGIE_FAILURE_TTL 設定（預設 3600）。"""
+    global _failure_cache
+    with _code_cache_lock:
+        if _failure_cache is None:
+            from veggie_replay import state_path
+            _failure_cache = FailureCache(
+                state_path(DEFAULT_FAILURE_CACHE_FILE),
+                ttl=float(os.environ.get("VEGGIE_FAILURE_TTL", 3600)),
+            )
+        return _failure_cache
+
+
+class TTLCache:
+    """
+    記憶體中的 TTL 快取（執行緒安全）：資料保存 ttl 秒，最多 max_entries 筆，超過時先移除最久沒用的資料。
+    """
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """取得快取資料，沒有或已過期回傳 default。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            saved_at, value = entry
+            if time.monotonic() - saved_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """寫入快取資料。"""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """清除指定的快取資料；不指定則全部清除。"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,171 @@
+import os
+import time
+import signal
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 沒有 fcntl：不使用檔案鎖（由工作排程器設定避免重疊執行）。
+    fcntl = None
+
+
+# 預設排程：每週一早上 9 點（cron 格式：分 時 日 月 星期）。
+DEFAULT_CRON = "0 9 * * 1"
+# 防止兩個排程同時執行的鎖檔。
+DEFAULT_LOCK_FILE = Path(__file__).parent / "veggie_schedule.lock"
+
+
+class CronSchedule:
+    """
+    cron 排程（分 時 日 月 星期，星期 0 或 7 為週日）。
+    每個欄位支援 *、數字、範圍 a-b、間隔 */n 或 a-b/n，以及以逗號分隔的清單。
+    日與星期都有指定時，符合其中一個即可（與 cron 相同）。
+    """
+
+    FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"cron 格式需要 5 個欄位（分 時 日 月 星期）：{expression}")
+        self.expression = expression
+        values = [self._parse(part, low, high) for part, (_, low, high) in zip(parts, self.FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = values
+        # 星期 7 與 0 都代表週日。
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = parts[2] == "*"
+        self.any_weekday = parts[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> set[int]:
+        values = set()
+        for item in field.split(","):
+            spec, _, step = item.partition("/")
+            if spec == "*":
+                start, end = low, high
+            elif "-" in spec:
+                start, end = map(int, spec.split("-"))
+            else:
+                start = end = int(spec)
+                # 「5/15」代表從 5 開始每 15 一次。
+                if step:
+                    end = high
+            if not (low <= start <= end <= high):
+                raise ValueError(f"cron 欄位超出範圍 {low}-{high}：{field}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        # Python 的星期一為 0；cron 的星期日為 0。
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """moment 之後（不含）下一個符合排程的時間（精確到分鐘）。"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # 最多往後找 5 年（例如 2 月 29 日）。
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months or not self._day_matches(moment):
+                moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"cron 排程沒有符合的時間：{self.expression}")
+
+
+@contextmanager
+def run_lock(path: Path = DEFAULT_LOCK_FILE):
+    """
+    檔案鎖（fcntl.flock）：同一時間只有一個排程在執行，包含外部排程器啟動的單次執行。
+    已被其他程式鎖住時 yield False，呼叫端應略過這次執行。
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_locked(task: Callable[[], None], lock_path: Path = DEFAULT_LOCK_FILE) -> bool:
+    """取得檔案鎖後執行 task，回傳是否有執行。"""
+    with run_lock(lock_path) as acquired:
+        if not acquired:
+            logging.warning("⏭️ 上一次排程還在執行，略過這次執行。")
+            return False
+        task()
+        return True
+
+
+async def run_daemon(
+        task: Callable[[], None],
+        cron: str = DEFAULT_CRON,
+        jitter: float = 0,
+        lock_path: Path = DEFAULT_LOCK_FILE,
+        run_now: bool = False,
+    ):
+    """
+    常駐排程：依 cron 排程執行 task，每次另外隨機延後 0 ~ jitter 秒，避免準點同時湧入網站。
+    同一個程式持續執行，HTTP 連線、快取與瀏覽器都保持暖機，不必每次重新啟動。
+    收到 SIGTERM / SIGINT 時不再排下一次；正在執行的 task 會先完成再結束。
+    """
+    schedule = CronSchedule(cron)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    logging.info(f"🕒 常駐排程啟動：{cron}（隨機延後最多 {jitter:g} 秒）")
+    next_run = datetime.now() if run_now else None
+    while not stop.is_set():
+        if next_run is None:
+            next_run = schedule.next_after(datetime.now()) + timedelta(seconds=random.uniform(0, jitter))
+            logging.info(f"🕒 下一次執行：{next_run:%Y-%m-%d %H:%M:%S}")
+
+        # 等到執行時間，或提前收到結束訊號。
+        delay = (next_run - datetime.now()).total_seconds()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+
+        # 在背景執行緒執行，事件迴圈仍可處理結束訊號。
+        started = time.monotonic()
+        await asyncio.to_thread(run_locked, task, lock_path)
+        logging.info(f"✅ 排程執行完成（{time.monotonic() - started:.1f} 秒）")
+        next_run = None
+
+    logging.info("🛑 收到結束訊號，常駐排程結束。")
+
+
+def daemon_options_from_env() -> dict:
+    """常駐排程的設定：VEGGIE_SCHEDULE_CRON、VEGGIE_SCHEDULE_JITTER（秒）、VEGGIE_SCHEDULE_LOCK。"""
+    return {
+        "cron": os.environ.get("VEGGIE_SCHEDULE_CRON", DEFAULT_CRON),
+        "jitter": float(os.environ.get("VEGGIE_SCHEDULE_JITTER", 300)),
+        "lock_path": Path(os.environ.get("VEGGIE_SCHEDULE_LOCK", DEFAULT_LOCK_FILE)),
+    }
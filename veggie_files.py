@@ -0,0 +1,61 @@
+import os
+import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+
+try:
+    import fcntl
+except ImportError:
+    # Windows 沒有 fcntl：不使用跨程式的檔案鎖。
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: Path):
+    """
+    跨程式的檔案鎖（fcntl.flock，等到取得為止），鎖住 path 旁邊的 .lock 檔。
+    用來保護「讀取 → 修改 → 寫回」，兩個程式（例如網頁與常駐排程）不會互相蓋掉對方的修改。
+    """
+    if fcntl is None:
+        yield
+        return
+
+    path = Path(path)
+    with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_text_atomic(path: Path, text: str):
+    """
+    寫入文字檔：先寫到同一個資料夾裡名稱不重複的暫存檔，再一次取代原檔案。
+    寫到一半中斷不會留下損毀的檔案，其他程式也不會讀到寫到一半的內容；
+    兩個程式同時寫入時各用各的暫存檔，結果是其中一個完整的版本。
+    """
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False,
+    ) as f:
+        tmp_path = Path(f.name)
+        try:
+            f.write(text)
+        except BaseException:
+            f.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+    try:
+        # NamedTemporaryFile 只有建立者能讀寫，改回一般檔案的權限。
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_json_atomic(path: Path, data, indent: int = 2):
+    """以 write_text_atomic() 寫入 JSON 檔（保留中文，不轉成 \\u 編碼）。"""
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent))
@@ -0,0 +1,250 @@
+import os
+import time
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+from veggie_metrics import get_metrics # 傳輸量與條件式請求命中率。
+from veggie_cache import TTLCache # 記憶體中的 TTL 快取。
+
+
+# 網站位址，可用環境變數 VEGGIE_BASE_URL 改成本機的測試伺服器（例如基準測試）。
+DEFAULT_BASE_URL = "https://www.twfood.cc"
+
+# 預設逾時秒數：（建立連線, 讀取回應）。
+DEFAULT_TIMEOUT = (5, 15)
+
+# 假身分：Windows 10 / 64 位元作業系統 / Chrome 瀏覽器 v85。
+DEFAULT_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/85.0.4183.83 Safari/537.36'
+    ),
+}
+
+
+def site_url(path: str = "") -> str:
+    """組合網站網址，例如 site_url("/search") → https://www.twfood.cc/search。"""
+    return os.environ.get("VEGGIE_BASE_URL", DEFAULT_BASE_URL).rstrip("/") + path
+
+
+def _accept_encoding() -> str:
+    """有安裝 brotli 才宣告支援 br，否則 requests 無法解壓縮。"""
+    try:
+        import brotli  # noqa: F401
+        return "gzip, deflate, br"
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            return "gzip, deflate, br"
+        except ImportError:
+            return "gzip, deflate"
+
+
+def build_session(pool_size: int = 16, retries: int = 3, backoff: float = 0.5) -> "requests.Session":
+    """
+    建立共用的 requests.Session：保持連線（keep-alive）、調整連線池大小，
+    並在連線錯誤或 5xx 時以指數退避（0.5、1、2 秒…）自動重試。
+    """
+    # 第一次送出請求時才匯入 requests，加快程式啟動。
+    import requests
+    from urllib3.util.retry import Retry
+    from veggie_replay import build_adapter
+
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    # 依 VEGGIE_HTTP_MODE 決定直接連線、錄製或重播（見 veggie_replay）。
+    adapter = build_adapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers["Accept-Encoding"] = _accept_encoding()
+    return session
+
+
+class CircuitOpenError(Exception):
+    """斷路器開啟中：上游連續失敗，暫時不送出請求，直接失敗。"""
+
+
+class CircuitBreaker:
+    """
+    斷路器：同一個上游端點連續失敗 failure_threshold 次後開啟，冷卻 cooldown 秒內的請求直接失敗；
+    冷卻結束後放行一個試探請求（半開），成功就恢復，失敗就再冷卻一次。
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """送出請求前檢查；斷路器開啟中則丟出 CircuitOpenError。"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                raise CircuitOpenError(f"{self.name} 暫時無法連線，稍後再試")
+            # 冷卻結束：放行一個試探請求。
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """取得指定端點的斷路器（同名共用）。"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def endpoint_name(url: str) -> str:
+    """斷路器以「主機 + 路徑」區分端點，例如 www.twfood.cc/search。"""
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def _wire_bytes(res: "requests.Response") -> int:
+    """回應實際在網路上傳輸的位元組數（gzip / br 壓縮後）；無法得知時以解壓縮後的大小計算。"""
+    try:
+        # urllib3 的 tell() 是從連線讀到的位元組數（解壓縮前）。
+        if count := res.raw.tell():
+            return count
+    except (AttributeError, OSError, ValueError):
+        pass
+    if (length := res.headers.get("Content-Length", "")).isdigit():
+        return int(length)
+    return len(res.content)
+
+
+class HttpClient:
+    """
+    所有爬蟲共用的 HTTP 用戶端。
+    對同一網址會記住 ETag / Last-Modified，下次以條件式請求詢問；伺服器回 304 時直接沿用上次的回應。
+    記住的回應最多 max_validators 筆、保存 validator_ttl 秒（每週成交價的網址含日期，數量會一直增加）。
+    """
+
+    def __init__(
+            self,
+            session: Optional["requests.Session"] = None,
+            timeout=DEFAULT_TIMEOUT,
+            max_validators: int = 256,
+            validator_ttl: float = 24 * 3600,
+        ):
+        self.session = session
+        # 不自動重試的連線（有整體時間預算的查詢使用），第一次用到時才建立。
+        self._no_retry_session: Optional["requests.Session"] = None
+        self.timeout = timeout
+        self._validators = TTLCache(ttl=validator_ttl, max_entries=max_validators)
+        self._lock = threading.Lock()
+
+    def get(
+            self,
+            url: str,
+            params: Optional[dict] = None,
+            headers: Optional[dict] = None,
+            timeout=None,
+            conditional: bool = True,
+            retry: bool = True,
+        ) -> "requests.Response":
+        """
+        送出 GET 請求；timeout 不指定時使用預設逾時。
+        retry=False 時失敗不自動重試（呼叫端有整體時間預算，時間到之後不應該再對網站送出請求）。
+        """
+        import requests
+
+        with self._lock:
+            if self.session is None:
+                self.session = build_session()
+            if not retry and self._no_retry_session is None:
+                self._no_retry_session = build_session(retries=0)
+        session = self.session if retry else self._no_retry_session
+
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        request_headers = dict(headers or {})
+
+        cached = self._validators.get(full_url) if conditional else None
+        if cached:
+            if cached.headers.get("ETag"):
+                request_headers["If-None-Match"] = cached.headers["ETag"]
+            if cached.headers.get("Last-Modified"):
+                request_headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+        # 每個端點各自一個斷路器：連線錯誤、逾時或 5xx 都算失敗。
+        breaker = get_circuit_breaker(endpoint_name(url))
+        breaker.before_call()
+        try:
+            with get_metrics().timer("http"):
+                res = session.get(
+                    full_url,
+                    headers=request_headers,
+                    timeout=timeout or self.timeout,
+                )
+        except Exception as e:
+            from veggie_replay import ReplayMissError
+            # 重播模式沒有錄製檔不是網站的問題，不計入斷路器（否則錄製過的網址也會被擋下）。
+            if not isinstance(e, ReplayMissError):
+                breaker.record_failure()
+            raise
+        if res.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        get_metrics().add_bytes(_wire_bytes(res))
+        if cached:
+            get_metrics().cache_result("http_conditional", hit=res.status_code == 304)
+
+        # 內容沒變，沿用上次的回應。
+        if res.status_code == 304 and cached:
+            return cached
+
+        if conditional and res.ok and (res.headers.get("ETag") or res.headers.get("Last-Modified")):
+            self._validators.set(full_url, res)
+        return res
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """取得程式共用的 HTTP 用戶端。"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def http_get(url: str, params: Optional[dict] = None, **kwargs) -> "requests.Response":
+    """使用共用 HTTP 用戶端送出 GET 請求。"""
+    return get_http_client().get(url, params=params, **kwargs)
@@ -0,0 +1,191 @@
+import os
+import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+import time
+import uuid
+import logging
+import smtplib # Python 的內建郵件傳送模組，用來透過 SMTP 協定發送 Email。
+from dataclasses import dataclass, field, asdict
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Iterable, Optional
+from email.mime.text import MIMEText # 建立純文字格式的 email 內容物件。
+from email.mime.multipart import MIMEMultipart # 建立多格式的 email 內容物件。
+from veggie_metrics import get_metrics # 寄信耗時。
+from veggie_files import write_json_atomic # 先寫暫存檔再取代的 JSON 寫入。
+
+
+# 寄不出去的信會存在這個資料夾，下次執行時重寄。
+DEFAULT_OUTBOX_DIR = Path(__file__).parent / "outbox"
+
+
+class MailConnectionError(Exception):
+    """無法連線或登入 SMTP 主機：同一批剩下的信也寄不出去。"""
+
+
+@dataclass
+class MailConfig:
+    from_email: str
+    password: str
+    host: str = "smtp.gmail.com"
+    port: int = 587
+    starttls: bool = True
+    # 每秒最多寄出幾封信（0 代表不限制）。
+    rate_per_second: float = 2.0
+
+    @classmethod
+    def from_env(cls, from_email: str, password: str) -> "MailConfig":
+        """帳號密碼由呼叫端提供，SMTP 主機等設定可用環境變數覆寫（例如測試時改用本機 SMTP）。"""
+        return cls(
+            from_email=from_email,
+            password=password,
+            host=os.environ.get("VEGGIE_SMTP_HOST", "smtp.gmail.com"),
+            port=int(os.environ.get("VEGGIE_SMTP_PORT", 587)),
+            starttls=os.environ.get("VEGGIE_SMTP_STARTTLS", "1") != "0",
+            rate_per_second=float(os.environ.get("VEGGIE_SMTP_RATE", 2.0)),
+        )
+
+
+@dataclass
+class OutgoingMail:
+    to_email: str
+    subject: str
+    body: str
+    attempts: int = 0
+    mail_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    created_at: float = field(default_factory=time.time)
+
+
+class Outbox:
+    """硬碟上的寄件匣：一封信一個 JSON 檔。超過 max_attempts 次仍失敗的信移到 failed 子資料夾。"""
+
+    def __init__(self, directory: Path = DEFAULT_OUTBOX_DIR, max_attempts: int = 5):
+        self.directory = Path(directory)
+        self.max_attempts = max_attempts
+
+    def _path(self, mail: OutgoingMail) -> Path:
+        return self.directory / f"{mail.mail_id}.json"
+
+    def pending(self) -> list[OutgoingMail]:
+        """讀取所有待重寄的信（依建立時間排序）。"""
+        if not self.directory.exists():
+            return []
+        mails = []
+        for path in self.directory.glob("*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    mails.append(OutgoingMail(**json.load(f)))
+            except (OSError, ValueError, TypeError) as e:
+                logging.warning(f"寄件匣檔案讀取失敗：{path} → {e}")
+        return sorted(mails, key=lambda mail: mail.created_at)
+
+    def save(self, mail: OutgoingMail):
+        """存入寄件匣；重試太多次的信移到 failed 子資料夾，不再自動重寄。"""
+        directory = self.directory
+        if mail.attempts >= self.max_attempts:
+            directory = self.directory / "failed"
+            self.remove(mail)
+        directory.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(directory / f"{mail.mail_id}.json", asdict(mail))
+
+    def remove(self, mail: OutgoingMail):
+        self._path(mail).unlink(missing_ok=True)
+
+
+class Mailer:
+    """
+    批次寄信：同一批信共用一條已登入的 SMTP 連線，並依設定的速率寄出。
+    寄不出去的信存進寄件匣，下次寄信時會先重寄。
+    """
+
+    def __init__(self, config: MailConfig, outbox: Optional[Outbox] = None):
+        self.config = config
+        self.outbox = outbox or Outbox()
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_sent = 0.0
+
+    @get_metrics().timed("smtp_connect")
+    def _connect(self) -> smtplib.SMTP:
+        try:
+            server = smtplib.SMTP(self.config.host, self.config.port, timeout=30)
+            if self.config.starttls:
+                server.starttls()
+            if self.config.password:
+                server.login(self.config.from_email, self.config.password)
+        except (OSError, smtplib.SMTPException) as e:
+            raise MailConnectionError(f"無法連線到 SMTP 主機 {self.config.host}:{self.config.port}：{e}") from e
+        return server
+
+    def _disconnect(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def _throttle(self):
+        """控制寄信速率，避免被郵件伺服器視為大量寄信。"""
+        if self.config.rate_per_second <= 0:
+            return
+        wait = self._last_sent + 1 / self.config.rate_per_second - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_sent = time.monotonic()
+
+    def _build_message(self, mail: OutgoingMail) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = self.config.from_email
+        msg['To'] = mail.to_email
+        msg['Subject'] = mail.subject
+        msg.attach(MIMEText(mail.body, 'plain'))
+        return msg
+
+    def _send_one(self, mail: OutgoingMail):
+        # 連線中斷時重新連線一次再寄。
+        for retry in (True, False):
+            try:
+                if self._server is None:
+                    self._server = self._connect()
+                self._throttle()
+                with get_metrics().timer("smtp"):
+                    self._server.send_message(self._build_message(mail))
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._server = None
+                if not retry:
+                    raise
+
+    def send_batch(self, mails: Iterable[OutgoingMail], include_outbox: bool = True) -> tuple[list[OutgoingMail], list[OutgoingMail]]:
+        """
+        寄出一批信（預設會先重寄寄件匣裡的信），回傳（寄出成功的信, 寄出失敗並存入寄件匣的信）。
+        無法連線到 SMTP 主機時，剩下的信直接存入寄件匣，不再逐封等待連線逾時。
+        """
+        queue = (self.outbox.pending() if include_outbox else []) + list(mails)
+        sent, failed = [], []
+        try:
+            for i, mail in enumerate(queue):
+                try:
+                    self._send_one(mail)
+                    self.outbox.remove(mail)
+                    sent.append(mail)
+                except MailConnectionError as e:
+                    logging.warning(f"{e}，剩下 {len(queue) - i} 封信已存入寄件匣，下次執行時重寄。")
+                    # 只有這封信算一次失敗；其餘的信沒有實際寄出，不增加重試次數。
+                    mail.attempts += 1
+                    for pending in queue[i:]:
+                        self.outbox.save(pending)
+                    failed.extend(queue[i:])
+                    break
+                except Exception as e:
+                    logging.warning(f"寄信給 {mail.to_email} 失敗，已存入寄件匣：{e}")
+                    # 連線可能已經壞掉，下一封信重新連線。
+                    self._disconnect()
+                    mail.attempts += 1
+                    self.outbox.save(mail)
+                    failed.append(mail)
+        finally:
+            self._disconnect()
+        return sent, failed
+
+    def retry_outbox(self) -> tuple[list[OutgoingMail], list[OutgoingMail]]:
+        """只重寄寄件匣裡的信。"""
+        return self.send_batch([])
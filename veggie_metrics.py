@@ -0,0 +1,190 @@
+import os
+import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Optional
+from veggie_files import write_text_atomic # 先寫暫存檔再取代的文字檔寫入。
+
+
+# 指標輸出位置（環境變數 VEGGIE_METRICS_DIR）：runs.jsonl 每次執行一行，veggie.prom 為 Prometheus 文字格式。
+DEFAULT_METRICS_DIR = Path(__file__).parent / "metrics"
+# 每個階段最多保留幾筆最近的耗時計算百分位數（次數與總耗時仍包含全部），長時間執行的網頁不會一直佔用記憶體。
+MAX_SAMPLES = 1024
+
+
+def percentile(values: list[float], q: float) -> float:
+    """最近排名法（nearest-rank）的百分位數，q 介於 0 ~ 1。"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class Metrics:
+    """
+    執行期間的效能指標：各階段耗時、傳輸位元組數與各快取的命中次數。
+    timer() 量到的時間除了記在整體統計，也會寫入目前執行緒用 collect() 指定的 dict（例如單一水果的 timings）。
+    各階段只保留最近 max_samples 筆耗時計算 p50 / p95。
+    """
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """開始新的一次執行：清除所有統計。"""
+        with self._lock:
+            self.started_at = time.time()
+            # {階段: 最近的耗時}，以及全部的次數與總耗時。
+            self.durations: dict[str, deque[float]] = {}
+            self.counts: dict[str, int] = {}
+            self.sums: dict[str, float] = {}
+            self.bytes_received = 0
+            self.cache_hits: dict[str, int] = {}
+            self.cache_misses: dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            self.durations.setdefault(stage, deque(maxlen=self.max_samples)).append(seconds)
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+            self.sums[stage] = self.sums.get(stage, 0.0) + seconds
+        if (collected := getattr(self._local, "timings", None)) is not None:
+            collected[stage] = round(collected.get(stage, 0) + seconds, 6)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """量測 with 區塊的耗時（秒），發生例外也會記錄。"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str):
+        """裝飾器版本的 timer()。"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def collect(self, timings: dict):
+        """with 區塊內（同一個執行緒）量到的耗時也累加到 timings。"""
+        previous = getattr(self._local, "timings", None)
+        self._local.timings = timings
+        try:
+            yield timings
+        finally:
+            self._local.timings = previous
+
+    def add_bytes(self, count: int):
+        with self._lock:
+            self.bytes_received += count
+
+    def cache_result(self, cache: str, hit: bool):
+        """記錄一次快取查詢結果。"""
+        with self._lock:
+            counter = self.cache_hits if hit else self.cache_misses
+            counter[cache] = counter.get(cache, 0) + 1
+
+    def summary(self) -> dict:
+        """整理成一筆紀錄：各階段次數、總耗時與 p50 / p95，傳輸量與各快取命中率。"""
+        with self._lock:
+            durations = {stage: list(values) for stage, values in self.durations.items()}
+            counts, sums = dict(self.counts), dict(self.sums)
+            hits, misses = dict(self.cache_hits), dict(self.cache_misses)
+            bytes_received, started_at = self.bytes_received, self.started_at
+
+        caches = {}
+        for cache in sorted(set(hits) | set(misses)):
+            hit, miss = hits.get(cache, 0), misses.get(cache, 0)
+            caches[cache] = {"hits": hit, "misses": miss, "hit_rate": round(hit / (hit + miss), 4)}
+
+        return {
+            "started_at": started_at,
+            "finished_at": time.time(),
+            "stages": {
+                stage: {
+                    "count": counts[stage],
+                    "sum": round(sums[stage], 6),
+                    "p50": round(percentile(values, 0.5), 6),
+                    "p95": round(percentile(values, 0.95), 6),
+                }
+                for stage, values in sorted(durations.items())
+            },
+            "bytes_received": bytes_received,
+            "caches": caches,
+        }
+
+    def export(self, directory: Optional[Path] = None, extra: Optional[dict] = None) -> dict:
+        """
+        把這次執行的統計追加到 runs.jsonl，並覆寫 Prometheus 文字格式的 veggie.prom
+        （可交給 node_exporter 的 textfile collector 讀取）。回傳寫入的紀錄。
+        """
+        directory = Path(directory or os.environ.get("VEGGIE_METRICS_DIR", DEFAULT_METRICS_DIR))
+        directory.mkdir(parents=True, exist_ok=True)
+        record = {**self.summary(), **(extra or {})}
+
+        with open(directory / "runs.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        # textfile collector 不會讀到寫到一半的檔案。
+        write_text_atomic(directory / "veggie.prom", to_prometheus(record))
+        return record
+
+
+def to_prometheus(record: dict) -> str:
+    """把 summary() 的紀錄轉成 Prometheus 文字格式。"""
+    lines = [
+        "# HELP veggie_stage_seconds Duration of each pipeline stage in the last run.",
+        "# TYPE veggie_stage_seconds summary",
+    ]
+    for stage, stats in record["stages"].items():
+        lines += [
+            f'veggie_stage_seconds{{stage="{stage}",quantile="0.5"}} {stats["p50"]}',
+            f'veggie_stage_seconds{{stage="{stage}",quantile="0.95"}} {stats["p95"]}',
+            f'veggie_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]}',
+            f'veggie_stage_seconds_count{{stage="{stage}"}} {stats["count"]}',
+        ]
+
+    lines += [
+        "# HELP veggie_http_received_bytes Response bytes received from upstream in the last run.",
+        "# TYPE veggie_http_received_bytes gauge",
+        f'veggie_http_received_bytes {record["bytes_received"]}',
+        "# HELP veggie_cache_hit_ratio Cache hit ratio in the last run.",
+        "# TYPE veggie_cache_hit_ratio gauge",
+    ]
+    lines += [f'veggie_cache_hit_ratio{{cache="{cache}"}} {stats["hit_rate"]}' for cache, stats in record["caches"].items()]
+    lines += [
+        "# HELP veggie_cache_requests Cache lookups in the last run.",
+        "# TYPE veggie_cache_requests gauge",
+    ]
+    for cache, stats in record["caches"].items():
+        lines += [
+            f'veggie_cache_requests{{cache="{cache}",result="hit"}} {stats["hits"]}',
+            f'veggie_cache_requests{{cache="{cache}",result="miss"}} {stats["misses"]}',
+        ]
+    lines += [
+        "# HELP veggie_last_run_timestamp_seconds Unix time the last run finished.",
+        "# TYPE veggie_last_run_timestamp_seconds gauge",
+        f'veggie_last_run_timestamp_seconds {record["finished_at"]}',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """取得程式共用的效能指標。"""
+    return _metrics
@@ -0,0 +1,62 @@
+import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+import hashlib
+from dataclasses import dataclass, field, asdict
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Optional, Sequence
+from veggie_subscriptions import Subscriber
+from veggie_files import write_json_atomic # 先寫暫存檔再取代的 JSON 寫入。
+
+
+# 排程的通知紀錄：上次處理到的交易週與每位訂閱者已通知過的水果。
+DEFAULT_STATE_FILE = Path(__file__).parent / "notify_state.json"
+
+
+def subscribers_fingerprint(subscribers: Sequence[Subscriber]) -> str:
+    """訂閱清單（含水果與規則）的指紋，清單有變動時指紋就不同。"""
+    data = sorted((asdict(subscriber) for subscriber in subscribers), key=lambda entry: entry["email"].lower())
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class NotifyState:
+    # 上次完整執行時網站最新的交易週（endDay）。
+    last_trade_day: Optional[str] = None
+    # 上次完整執行時的訂閱清單指紋。
+    subscribers_fingerprint: Optional[str] = None
+    # {Email: {水果: 已通知的週期}}，同一週期不重複通知。
+    notified: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    def is_fresh(self, trade_day: Optional[str], fingerprint: str) -> bool:
+        """交易週與訂閱清單都沒變：這次執行不會有新的通知。"""
+        return bool(trade_day) and trade_day == self.last_trade_day and fingerprint == self.subscribers_fingerprint
+
+    def already_notified(self, email: str, fruit: str, period: str) -> bool:
+        return self.notified.get(email.lower(), {}).get(fruit) == period
+
+    def mark_notified(self, email: str, fruit: str, period: str):
+        self.notified.setdefault(email.lower(), {})[fruit] = period
+
+    def prune(self, subscribers: Sequence[Subscriber]):
+        """移除已經取消訂閱的 Email 的紀錄。"""
+        emails = {subscriber.email.lower() for subscriber in subscribers}
+        self.notified = {email: fruits for email, fruits in self.notified.items() if email in emails}
+
+
+def load_notify_state(path: Path = DEFAULT_STATE_FILE) -> NotifyState:
+    """讀取通知紀錄；檔案不存在或損毀時從頭開始。"""
+    path = Path(path)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return NotifyState(
+            last_trade_day=data.get("last_trade_day"),
+            subscribers_fingerprint=data.get("subscribers_fingerprint"),
+            notified={email: dict(fruits) for email, fruits in data.get("notified", {}).items()},
+        )
+    except (OSError, ValueError, TypeError, AttributeError):
+        return NotifyState()
+
+
+def save_notify_state(state: NotifyState, path: Path = DEFAULT_STATE_FILE):
+    """寫入通知紀錄。"""
+    write_json_atomic(path, asdict(state))
@@ -0,0 +1,100 @@
+import re # 正規表達式模組，用來進行文字比對與格式驗證。
+from html.parser import HTMLParser
+from urllib.parse import unquote
+from typing import Optional
+
+
+def html_parser_name() -> str:
+    """有安裝 lxml 就用 lxml（C 實作，較快），否則使用內建的 html.parser。"""
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+def parse_price_cards(html: str) -> list:
+    """
+    只解析推薦品項的區塊 <div class="... vege_price">，其餘網頁內容不建立物件。
+    回傳 BeautifulSoup 的 Tag 串列。
+    """
+    # 用到時才匯入，加快程式啟動。
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # 用正規表達式比對 class，多個 class 的區塊（例如 "col-md-12 vege_price"）也能找到。
+    only_cards = SoupStrainer("div", class_=re.compile(r"\bvege_price\b"))
+    soup = BeautifulSoup(html, html_parser_name(), parse_only=only_cards)
+    return soup.find_all("div", class_="vege_price")
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _FirstLinkParser(HTMLParser):
+    """串流解析：在 <div class="blog-posts"> 內找到第一個 <a href> 就停止，不必讀完整份網頁。"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.href: Optional[str] = None
+        self._depth = 0 # 目前位於 div.blog-posts 內的 div 層數，0 代表不在裡面。
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "div":
+            if self._depth:
+                self._depth += 1
+            elif "blog-posts" in (attrs.get("class") or "").split():
+                self._depth = 1
+        elif tag == "a" and self._depth:
+            self.href = attrs.get("href")
+            raise _StopParsing()
+
+    def handle_endtag(self, tag):
+        if tag == "div" and self._depth:
+            self._depth -= 1
+
+
+def parse_first_search_link(html: str) -> Optional[dict]:
+    """
+    找出搜尋結果 div.blog-posts 裡第一個 <a> 超連結，回傳它的屬性（沒有找到回傳 None）。
+    找到後立即停止解析。
+    """
+    parser = _FirstLinkParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except _StopParsing:
+        return {"href": parser.href} if parser.href is not None else {}
+    return None
+
+
+class _CatalogLinkParser(HTMLParser):
+    """串流解析：收集所有指向 /{kind}/{品項代碼}/{品項名稱} 的連結。"""
+
+    def __init__(self, kind: str):
+        super().__init__(convert_charrefs=True)
+        self.prefix = f"/{kind}/"
+        self.items = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        href = dict(attrs).get("href") or ""
+        if not href.startswith(self.prefix):
+            return
+        parts = [unquote(part) for part in href[len(self.prefix):].split("/") if part]
+        # parts = [品項代碼, 品項名稱]；只有代碼的連結以代碼當作名稱。
+        if parts and parts[0] not in self.items:
+            self.items[parts[0]] = parts[1] if len(parts) > 1 else parts[0]
+
+
+def parse_catalog_links(html: str, kind: str) -> dict[str, str]:
+    """
+    從蔬菜或水果分頁（kind 為 "vege" 或 "fruit"）找出所有品項連結。
+    回傳 {品項代碼: 品項名稱}。
+    """
+    parser = _CatalogLinkParser(kind)
+    parser.feed(html)
+    parser.close()
+    return parser.items
@@ -0,0 +1,86 @@
+import sqlite3 # Python 內建的 SQLite 資料庫模組。
+import threading
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Iterable, Optional
+
+
+# 資料庫檔案與 fruit_list.json 放在同一個資料夾。
+DEFAULT_PRICE_DB_FILE = Path(__file__).parent / "weekly_prices.sqlite3"
+
+
+class WeeklyPriceStore:
+    """
+    本地的「每週成交價」資料庫（SQLite），以 (itemCode, endDay) 為主鍵只增不減。
+    每次只需要向網站下載比資料庫最新週期更新的資料。
+    """
+
+    def __init__(self, path: Path = DEFAULT_PRICE_DB_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # 多個執行緒共用同一個連線，由 self._lock 保護。
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS weekly_prices (
+                    item_code TEXT NOT NULL,
+                    end_day TEXT NOT NULL,
+                    start_day TEXT,
+                    avg_price REAL,
+                    PRIMARY KEY (item_code, end_day)
+                )
+            """)
+
+    def latest_end_day(self, item_code: str) -> Optional[str]:
+        """回傳資料庫中該品項最新的週期，沒有資料則回傳 None。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(end_day) FROM weekly_prices WHERE item_code = ?",
+                (item_code,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def add_weeks(self, item_code: str, weeks: Iterable[dict]) -> int:
+        """寫入網站回傳的每週成交價（同一週期重複寫入會以新資料為準），回傳寫入筆數。"""
+        rows = [
+            (item_code, week["endDay"], week.get("startDay"), week.get("avgPrice"))
+            for week in weeks
+            if week.get("endDay")
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO weekly_prices (item_code, end_day, start_day, avg_price) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def get_weeks(self, item_code: str, since: Optional[str] = None) -> list[dict]:
+        """讀取該品項的每週成交價（依週期由舊到新），欄位名稱與網站 API 相同。"""
+        sql = "SELECT end_day, start_day, avg_price FROM weekly_prices WHERE item_code = ?"
+        params = [item_code]
+        if since:
+            sql += " AND end_day >= ?"
+            params.append(since)
+        sql += " ORDER BY end_day ASC"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {"itemCode": item_code, "endDay": end_day, "startDay": start_day, "avgPrice": avg_price}
+            for end_day, start_day, avg_price in rows
+        ]
+
+
+_price_store: Optional[WeeklyPriceStore] = None
+_price_store_lock = threading.Lock()
+
+
+def get_price_store() -> WeeklyPriceStore:
+    """取得程式共用的每週成交價資料庫。"""
+    global _price_store
+    with _price_store_lock:
+        if _price_store is None:
+            # 錄製／重播模式使用暫存的資料庫（見 veggie_replay.state_path）。
+            from veggie_replay import state_path
+            _price_store = WeeklyPriceStore(state_path(DEFAULT_PRICE_DB_FILE))
+        return _price_store
@@ -0,0 +1,236 @@
+import os
+import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+import time
+import logging
+import threading
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Optional, Sequence
+from veggie_http import http_get, site_url # 共用的 HTTP 用戶端。
+from veggie_parse import parse_catalog_links # 快速的網頁解析。
+from veggie_price_store import get_price_store # 本地的每週成交價資料庫。
+
+
+# 各分類的目錄分頁路徑。
+CATALOG_PATHS = {
+    "vege": "/vege",
+    "fruit": "/fruit",
+}
+# 快照檔案存放位置。
+DEFAULT_SNAPSHOT_DIR = Path(__file__).parent / "recommend_snapshot"
+# 快照最多使用幾秒就重新建立（環境變數 VEGGIE_RECOMMEND_MAX_AGE，預設一天），新的一週交易資料才會反映在排行榜。
+DEFAULT_SNAPSHOT_MAX_AGE = 24 * 3600
+
+
+def scrape_catalog(kinds: Sequence[str] = ("vege", "fruit")) -> dict[str, tuple[str, str]]:
+    """從各分類分頁取得品項目錄，回傳 {品項代碼: (品項名稱, 分類)}。"""
+    catalog = {}
+    for kind in kinds:
+        res = http_get(site_url(CATALOG_PATHS[kind]))
+        res.raise_for_status()
+        for code, name in parse_catalog_links(res.text, kind).items():
+            catalog.setdefault(code, (name, kind))
+    return catalog
+
+
+class RecommendationEngine:
+    """
+    本地推薦引擎：把整個目錄的每週成交價整理成「品項 × 週」的 NumPy 陣列（快照），
+    依「本週均價比自己近一年平均便宜多少」排序，用 argpartition 取前 N 名。
+    快照建立後查詢只需要幾毫秒，也可以存成檔案並以 memory-map 方式載入。
+    """
+
+    def __init__(
+            self,
+            codes: list[str],
+            names: list[str],
+            kinds: list[str],
+            weeks: list[str],
+            prices,
+            built_at: Optional[float] = None,
+        ):
+        import numpy as np
+
+        self.codes = list(codes)
+        self.names = list(names)
+        self.kinds = np.asarray(kinds)
+        self.weeks = list(weeks)
+        # prices[i, j]：第 i 個品項在第 j 週的均價，沒有交易為 NaN。
+        self.prices = prices
+        # 快照建立時間（Unix 時間），用來判斷是否該重新建立。
+        self.built_at = time.time() if built_at is None else built_at
+        self._scores = None
+
+    @classmethod
+    def from_store(cls, catalog: dict[str, tuple[str, str]], weeks: int = 52, store=None) -> "RecommendationEngine":
+        """用本地資料庫中的每週成交價建立快照，只保留最近 weeks 週。"""
+        import numpy as np
+
+        store = store or get_price_store()
+        codes = list(catalog)
+        history = {code: store.get_weeks(code) for code in codes}
+
+        # 週的座標軸：所有品項出現過的週期，取最近 weeks 週。
+        all_weeks = sorted({week["endDay"] for rows in history.values() for week in rows})[-weeks:]
+        column = {day: j for j, day in enumerate(all_weeks)}
+
+        prices = np.full((len(codes), len(all_weeks)), np.nan, dtype=np.float32)
+        for i, code in enumerate(codes):
+            for week in history[code]:
+                if (j := column.get(week["endDay"])) is not None and week.get("avgPrice"):
+                    prices[i, j] = week["avgPrice"]
+
+        return cls(
+            codes=codes,
+            names=[catalog[code][0] for code in codes],
+            kinds=[catalog[code][1] for code in codes],
+            weeks=all_weeks,
+            prices=prices,
+        )
+
+    @classmethod
+    def refresh(cls, kinds: Sequence[str] = ("vege", "fruit"), weeks: int = 52, chunk_size: int = 50) -> "RecommendationEngine":
+        """重新取得目錄並批次下載所有品項的每週成交價，建立新的快照。"""
+        # 與果價查詢共用批次下載與本地資料庫。
+        from veggie_w3 import sync_fruit_weeks
+
+        catalog = scrape_catalog(kinds)
+        sync_fruit_weeks(list(catalog), chunk_size=chunk_size, window=weeks)
+        return cls.from_store(catalog, weeks=weeks)
+
+    def save(self, directory: Path = DEFAULT_SNAPSHOT_DIR):
+        """把快照存成 prices.npy（數值）與 meta.json（品項與週期）。"""
+        import numpy as np
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "prices.npy", np.asarray(self.prices, dtype=np.float32))
+        with open(directory / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "codes": self.codes,
+                "names": self.names,
+                "kinds": self.kinds.tolist(),
+                "weeks": self.weeks,
+                "built_at": self.built_at,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: Path = DEFAULT_SNAPSHOT_DIR, mmap: bool = True) -> "RecommendationEngine":
+        """載入快照；mmap=True 時數值以 memory-map 方式讀取，不必整個載入記憶體。"""
+        import numpy as np
+
+        directory = Path(directory)
+        with open(directory / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        prices = np.load(directory / "prices.npy", mmap_mode="r" if mmap else None)
+        # 舊版快照沒有建立時間，視為已過期。
+        return cls(meta["codes"], meta["names"], meta["kinds"], meta["weeks"], prices, built_at=meta.get("built_at", 0))
+
+    def is_stale(self, max_age: float = DEFAULT_SNAPSHOT_MAX_AGE) -> bool:
+        """快照建立超過 max_age 秒：網站可能已有新的一週交易資料。"""
+        return time.time() - self.built_at > max_age
+
+    def scores(self):
+        """
+        計算每個品項的（本週均價, 近一年平均, 折扣比例）。
+        只有最新一週有交易、且至少有 4 週資料的品項才會有折扣，其餘為 -inf。
+        """
+        import numpy as np
+
+        if self._scores is None:
+            prices = np.asarray(self.prices, dtype=np.float64)
+            valid = ~np.isnan(prices)
+            counts = valid.sum(axis=1)
+            trailing = np.where(valid, prices, 0).sum(axis=1) / np.maximum(counts, 1)
+            latest = prices[:, -1] if prices.shape[1] else np.full(len(self.codes), np.nan)
+
+            ok = valid[:, -1] & (counts >= 4) & (trailing > 0) if prices.shape[1] else np.zeros(len(self.codes), bool)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                discount = np.where(ok, 1 - latest / trailing, -np.inf)
+            self._scores = (latest, trailing, discount)
+        return self._scores
+
+    def top_n(self, n: int = 5, kind: Optional[str] = None) -> list[dict]:
+        """取出折扣最大的前 n 個品項（可指定分類），依折扣由大到小排列。"""
+        import numpy as np
+
+        latest, trailing, discount = self.scores()
+        candidates = np.flatnonzero(np.isfinite(discount) & ((self.kinds == kind) if kind else True))
+        if n <= 0 or not len(candidates):
+            return []
+
+        # argpartition：只找出前 n 名（不必整個排序），再把這 n 名排序。
+        if len(candidates) > n:
+            candidates = candidates[np.argpartition(-discount[candidates], n - 1)[:n]]
+        candidates = candidates[np.argsort(-discount[candidates], kind="stable")]
+
+        return [
+            {
+                "代碼": self.codes[i],
+                "名稱": self.names[i],
+                "本週均價": round(float(latest[i]), 1),
+                "近一年均價": round(float(trailing[i]), 1),
+                "折扣(%)": round(float(discount[i]) * 100, 1),
+            }
+            for i in candidates
+        ]
+
+
+_engine: Optional[RecommendationEngine] = None
+# _engine_lock 只保護上面的共用變數（很快就放開）；_build_lock 讓同一時間只有一個重新建立快照的工作。
+_engine_lock = threading.Lock()
+_build_lock = threading.Lock()
+# 背景更新快照中。
+_refreshing = False
+# 快照更新失敗後，等這個時間（time.monotonic()）之後才再試一次。
+_retry_refresh_at = 0.0
+# 快照更新失敗後多久再試（秒）。
+REFRESH_RETRY_DELAY = 300
+
+
+def _rebuild_engine(force: bool = False) -> RecommendationEngine:
+    """重新建立快照並存檔（耗時，不持有 _engine_lock）；force=False 時若其他執行緒已經建好就直接使用。"""
+    global _engine
+    with _build_lock:
+        with _engine_lock:
+            if not force and _engine is not None:
+                return _engine
+        engine = RecommendationEngine.refresh()
+        engine.save()
+        with _engine_lock:
+            _engine = engine
+        return engine
+
+
+def _refresh_in_background():
+    global _refreshing, _retry_refresh_at
+    try:
+        _rebuild_engine(force=True)
+    except Exception as e:
+        with _engine_lock:
+            _retry_refresh_at = time.monotonic() + REFRESH_RETRY_DELAY
+        logging.warning(f"推薦快照更新失敗，{REFRESH_RETRY_DELAY} 秒內沿用舊的快照：{e}")
+    finally:
+        with _engine_lock:
+            _refreshing = False
+
+
+def get_recommend_engine(refresh: bool = False) -> RecommendationEngine:
+    """
+    取得程式共用的推薦引擎：優先使用記憶體中的快照，其次載入硬碟上的快照，都沒有才重新建立並存檔。
+    快照超過 VEGGIE_RECOMMEND_MAX_AGE 秒（預設一天）時先回傳舊的快照，並在背景重新建立
+    （每週成交價只下載新的週次）；背景更新失敗時暫時沿用舊的快照。
+    refresh=True 時等待重新建立完成。
+    """
+    global _engine, _refreshing
+    max_age = float(os.environ.get("VEGGIE_RECOMMEND_MAX_AGE", DEFAULT_SNAPSHOT_MAX_AGE))
+    with _engine_lock:
+        if _engine is None and not refresh and (DEFAULT_SNAPSHOT_DIR / "meta.json").exists():
+            _engine = RecommendationEngine.load()
+        if _engine is not None and not refresh:
+            if _engine.is_stale(max_age) and not _refreshing and time.monotonic() >= _retry_refresh_at:
+                _refreshing = True
+                threading.Thread(target=_refresh_in_background, name="recommend-refresh", daemon=True).start()
+            return _engine
+
+    # 還沒有快照，或明確要求重新建立：等待建立完成。
+    return _rebuild_engine(force=refresh)
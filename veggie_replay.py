@@ -0,0 +1,196 @@
+import os
+import re # 正規表達式模組，用來進行文字比對與格式驗證。
+import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Callable, Optional
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from veggie_files import write_json_atomic # 先寫暫存檔再取代的 JSON 寫入。
+
+
+# 連線模式（環境變數 VEGGIE_HTTP_MODE）：
+#   live   直接連線（預設）
+#   record 連線並把回應錄製成 fixture 檔案
+#   replay 完全不連線，只使用錄製好的回應
+LIVE, RECORD, REPLAY = "live", "record", "replay"
+# 錄製檔案存放位置（環境變數 VEGGIE_REPLAY_DIR）。
+DEFAULT_REPLAY_DIR = Path(__file__).parent / "replay_fixtures"
+
+# 回應內容已解碼存檔，這些標頭重播時不再適用。
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+# 網址中的日期（例如 endDay 的查詢範圍 "2024/01/05"，編碼後為 2024%2F01%2F05）會隨執行日期改變，比對時以萬用字元取代。
+_DATE_PATTERN = re.compile(r"\d{4}(?:-|/|%2F)\d{2}(?:-|/|%2F)\d{2}", re.IGNORECASE)
+
+
+class ReplayMissError(requests.ConnectionError):
+    """重播模式下找不到對應的錄製檔。"""
+
+
+def http_mode() -> str:
+    mode = os.environ.get("VEGGIE_HTTP_MODE", LIVE).strip().lower()
+    if mode not in (LIVE, RECORD, REPLAY):
+        raise ValueError(f"VEGGIE_HTTP_MODE 只能是 {LIVE}、{RECORD} 或 {REPLAY}：{mode}")
+    return mode
+
+
+def replay_dir() -> Path:
+    return Path(os.environ.get("VEGGIE_REPLAY_DIR", DEFAULT_REPLAY_DIR))
+
+
+_state_dir: Optional[Path] = None
+_state_dir_lock = threading.Lock()
+
+
+def state_path(default: Path) -> Path:
+    """
+    本地狀態檔（每週成交價資料庫、水果代碼快取、失敗負快取）的位置。
+    live 模式使用 default；record / replay 模式改用這次執行專用的暫存資料夾（結束時刪除），
+    每次錄製與重播都從空的狀態開始、送出相同的請求，重播才能重複執行，也不會把重播的資料寫進正式的資料庫與快取。
+    """
+    global _state_dir
+    if http_mode() == LIVE:
+        return Path(default)
+    with _state_dir_lock:
+        if _state_dir is None:
+            _state_dir = Path(tempfile.mkdtemp(prefix="veggie-replay-state-"))
+            atexit.register(shutil.rmtree, _state_dir, ignore_errors=True)
+    return _state_dir / Path(default).name
+
+
+def _key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class FixtureStore:
+    """
+    錄製檔案：一個回應一個 JSON 檔，檔名是網址的雜湊值。
+    http/ 存 HTTP 回應，chart/ 存 Selenium 讀到的圖表文字。
+    重播時先找網址完全相同的檔案，找不到再忽略網址中的日期比對。
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._patterns: dict[str, dict[str, Path]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, url: str) -> Path:
+        return self.directory / kind / f"{_key(url)}.json"
+
+    def save(self, kind: str, url: str, data: dict):
+        path = self._path(kind, url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(path, {"url": url, **data})
+        with self._lock:
+            self._patterns.pop(kind, None)
+
+    def _pattern_index(self, kind: str) -> dict[str, Path]:
+        """{去除日期後的網址: 檔案}，第一次使用時建立。"""
+        with self._lock:
+            if kind not in self._patterns:
+                index = {}
+                for path in sorted((self.directory / kind).glob("*.json")):
+                    with open(path, "r", encoding="utf-8") as f:
+                        index[_DATE_PATTERN.sub("*", json.load(f)["url"])] = path
+                self._patterns[kind] = index
+            return self._patterns[kind]
+
+    def load(self, kind: str, url: str) -> Optional[dict]:
+        path = self._path(kind, url)
+        if not path.exists():
+            path = self._pattern_index(kind).get(_DATE_PATTERN.sub("*", url))
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_fixture_store(directory: Path) -> FixtureStore:
+    """同一個資料夾共用一個 FixtureStore（重播時的網址索引只建立一次）。"""
+    return FixtureStore(directory)
+
+
+def _build_response(request: "requests.PreparedRequest", data: dict) -> "requests.Response":
+    response = requests.Response()
+    response.status_code = data["status"]
+    response.reason = data.get("reason", "")
+    response.headers = CaseInsensitiveDict(data.get("headers", {}))
+    response._content = data["body"].encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = request.url
+    response.request = request
+    return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """重播模式的傳輸層：從錄製檔案回應請求，不會連線。沒有錄製的網址丟出 ReplayMissError。"""
+
+    def __init__(self, store: FixtureStore):
+        super().__init__()
+        self.store = store
+
+    def send(self, request, **kwargs):
+        if (data := self.store.load("http", request.url)) is None:
+            raise ReplayMissError(f"重播模式沒有這個網址的錄製檔：{request.url}", request=request)
+        return _build_response(request, data)
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """錄製模式的傳輸層：正常連線，並把回應（5xx 與 304 除外）存成錄製檔案。"""
+
+    def __init__(self, store: FixtureStore, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if response.status_code < 500 and response.status_code != 304:
+            self.store.save("http", request.url, {
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": {
+                    name: value
+                    for name, value in response.headers.items()
+                    if name.lower() not in _DROPPED_HEADERS
+                },
+                "body": response.text,
+            })
+        return response
+
+
+def build_adapter(**kwargs) -> BaseAdapter:
+    """依連線模式建立傳輸層；kwargs 是一般 HTTPAdapter 的參數（連線池、重試）。"""
+    mode = http_mode()
+    if mode == REPLAY:
+        return ReplayAdapter(get_fixture_store(replay_dir()))
+    if mode == RECORD:
+        return RecordingAdapter(get_fixture_store(replay_dir()), **kwargs)
+    return HTTPAdapter(**kwargs)
+
+
+def chart_texts(url: str, scrape: Callable[[], list[str]]) -> list[str]:
+    """
+    Selenium 讀取的圖表文字：live 模式直接呼叫 scrape()；
+    record 模式另外存檔；replay 模式直接讀取錄製檔，不會啟動瀏覽器。
+    """
+    mode = http_mode()
+    store = get_fixture_store(replay_dir())
+    if mode == REPLAY:
+        if (data := store.load("chart", url)) is None:
+            raise ReplayMissError(f"重播模式沒有這個頁面的錄製檔：{url}")
+        return data["texts"]
+
+    texts = scrape()
+    if mode == RECORD:
+        store.save("chart", url, {"texts": texts})
+    return texts
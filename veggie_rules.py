@@ -0,0 +1,113 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Iterable, Optional, Sequence
+
+
+class RuleKind(StrEnum):
+    PRICE_BELOW = 'price_below'                 # 成交價低於（含）指定金額。
+    PERCENT_BELOW_YEAR = 'percent_below_year'   # 成交價低於全年度平均成交價超過指定百分比。
+    WEEK_LOW = 'week_low'                       # 成交價是最近 N 週的最低價。
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    email: str
+    fruit: str
+    kind: RuleKind
+    threshold: float
+
+    def describe(self) -> str:
+        """通知信中的規則說明。"""
+        if self.kind == RuleKind.PRICE_BELOW:
+            return f"成交價低於 {self.threshold:g} 元"
+        if self.kind == RuleKind.WEEK_LOW:
+            return f"{int(self.threshold)} 週以來最低價"
+        if self.threshold:
+            return f"比全年度平均便宜 {self.threshold:g}% 以上"
+        return "低於全年度平均成交價"
+
+
+def default_rules(email: str, fruits: Iterable[str]) -> list[AlertRule]:
+    """沒有自訂規則時的預設規則：成交價低於全年度平均成交價（與原本的判斷相同）。"""
+    return [AlertRule(email, fruit, RuleKind.PERCENT_BELOW_YEAR, 0) for fruit in fruits]
+
+
+def parse_rules(email: str, fruits: Sequence[str], raw_rules: Iterable[dict]) -> list[AlertRule]:
+    """
+    把訂閱者設定的規則（例如 {"kind": "price_below", "threshold": 30, "fruit": "西瓜-大西瓜"}）轉成 AlertRule。
+    沒有指定 fruit 的規則套用到該訂閱者的所有水果；沒有任何規則則使用預設規則。
+    """
+    rules = []
+    for raw in raw_rules:
+        kind = RuleKind(raw["kind"])
+        threshold = float(raw.get("threshold", 0))
+        targets = [raw["fruit"]] if raw.get("fruit") else fruits
+        rules.extend(AlertRule(email, fruit, kind, threshold) for fruit in targets)
+    return rules or default_rules(email, fruits)
+
+
+def low_streak(prices: Sequence[float]) -> int:
+    """
+    最新一週的價格是最近幾週的最低價（含最新一週）。
+    例如 [30, 25, 28, 20] 回傳 4；[20, 25, 22] 回傳 2。
+    """
+    if not prices:
+        return 0
+    latest = prices[-1]
+    streak = 0
+    for price in reversed(prices):
+        if price < latest:
+            break
+        streak += 1
+    return streak
+
+
+class RuleIndex:
+    """
+    通知規則索引：依水果與規則種類分組，並依門檻排序。
+    新的一週成交價進來時用二分搜尋（bisect）直接找出所有觸發的規則，不必逐一檢查每位訂閱者。
+    """
+
+    def __init__(self, rules: Iterable[AlertRule] = ()):
+        grouped = {}
+        for rule in rules:
+            grouped.setdefault((rule.fruit, rule.kind), []).append(rule)
+
+        self._index = {}
+        for key, group in grouped.items():
+            group.sort(key=lambda rule: rule.threshold)
+            self._index[key] = ([rule.threshold for rule in group], group)
+
+    def __len__(self):
+        return sum(len(rules) for _, rules in self._index.values())
+
+    def _bucket(self, fruit: str, kind: RuleKind):
+        return self._index.get((fruit, kind), ((), ()))
+
+    def evaluate(
+            self,
+            fruit: str,
+            price: float,
+            year_average_price: Optional[float] = None,
+            streak: Optional[int] = None,
+        ) -> list[AlertRule]:
+        """回傳這週成交價觸發的所有規則。"""
+        triggered = []
+
+        # 1.成交價低於門檻：門檻 >= 成交價的規則都觸發。
+        thresholds, rules = self._bucket(fruit, RuleKind.PRICE_BELOW)
+        triggered.extend(rules[bisect_left(thresholds, price):])
+
+        # 2.比全年度平均便宜的百分比：門檻 < 實際折扣的規則都觸發。
+        if year_average_price:
+            discount = (1 - price / year_average_price) * 100
+            thresholds, rules = self._bucket(fruit, RuleKind.PERCENT_BELOW_YEAR)
+            triggered.extend(rules[:bisect_left(thresholds, discount)])
+
+        # 3.N 週最低價：N <= 目前連續最低週數的規則都觸發。
+        if streak:
+            thresholds, rules = self._bucket(fruit, RuleKind.WEEK_LOW)
+            triggered.extend(rules[:bisect_right(thresholds, streak)])
+
+        return triggered
@@ -0,0 +1,112 @@
+import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+import threading
+from dataclasses import dataclass, field, asdict
+from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
+from typing import Optional, Sequence
+from veggie_rules import AlertRule, RuleIndex, parse_rules
+from veggie_files import write_json_atomic # 先寫暫存檔再取代的 JSON 寫入。
+
+
+# 訂閱清單檔案（沿用原本的喜愛水果清單檔名）。
+DEFAULT_SUBSCRIPTION_FILE = Path(__file__).parent / "fruit_list.json"
+
+_file_lock = threading.Lock()
+
+
+@dataclass
+class Subscriber:
+    email: str
+    fruits: list[str] = field(default_factory=list)
+    # 自訂通知規則，例如 {"kind": "price_below", "threshold": 30, "fruit": "西瓜-大西瓜"}；
+    # 沒有設定時使用預設規則（成交價低於全年度平均成交價）。
+    rules: list[dict] = field(default_factory=list)
+
+    def alert_rules(self) -> list[AlertRule]:
+        """轉成通知規則。"""
+        return parse_rules(self.email, self.fruits, self.rules)
+
+
+def load_subscribers(path: Path = DEFAULT_SUBSCRIPTION_FILE) -> list[Subscriber]:
+    """
+    讀取所有訂閱者。
+    相容舊格式 {"email": ..., "fruits": [...]}（只有一位訂閱者）。
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    # 空白檔案視為沒有訂閱者。
+    if not text.strip():
+        return []
+    data = json.loads(text)
+
+    if "subscribers" in data:
+        entries = data["subscribers"]
+    elif data.get("email"):
+        entries = [data]
+    else:
+        entries = []
+
+    return [
+        Subscriber(
+            email=entry["email"],
+            fruits=list(entry.get("fruits", [])),
+            rules=list(entry.get("rules", [])),
+        )
+        for entry in entries
+        if entry.get("email")
+    ]
+
+
+def save_subscribers(subscribers: Sequence[Subscriber], path: Path = DEFAULT_SUBSCRIPTION_FILE):
+    """寫入所有訂閱者。"""
+    write_json_atomic(path, {"subscribers": [asdict(subscriber) for subscriber in subscribers]})
+
+
+def find_subscriber(email: str, path: Path = DEFAULT_SUBSCRIPTION_FILE) -> Optional[Subscriber]:
+    """依 Email（不分大小寫）找出訂閱者。"""
+    key = email.strip().lower()
+    for subscriber in load_subscribers(path):
+        if subscriber.email.lower() == key:
+            return subscriber
+    return None
+
+
+def upsert_subscriber(
+        email: str,
+        fruits: Sequence[str],
+        rules: Optional[Sequence[dict]] = None,
+        path: Path = DEFAULT_SUBSCRIPTION_FILE,
+    ) -> Subscriber:
+    """新增或更新一位訂閱者的水果清單（rules 不指定則保留原本的規則），其他訂閱者不受影響。"""
+    new = Subscriber(email=email.strip(), fruits=list(fruits), rules=list(rules or []))
+    with _file_lock:
+        subscribers = []
+        for subscriber in load_subscribers(path):
+            if subscriber.email.lower() != new.email.lower():
+                subscribers.append(subscriber)
+            elif rules is None:
+                new.rules = subscriber.rules
+        subscribers.append(new)
+        save_subscribers(subscribers, path)
+    return new
+
+
+def watched_fruits(subscribers: Sequence[Subscriber]) -> list[str]:
+    """所有訂閱者關注的水果聯集（含規則指定的水果，去除重複並保留順序），每種水果只需要查詢一次。"""
+    return list(dict.fromkeys(
+        rule.fruit
+        for subscriber in subscribers
+        for rule in subscriber.alert_rules()
+    ))
+
+
+def build_rule_index(subscribers: Sequence[Subscriber]) -> RuleIndex:
+    """把所有訂閱者的通知規則建成索引。"""
+    return RuleIndex(
+        rule
+        for subscriber in subscribers
+        for rule in subscriber.alert_rules()
+    )
@@ -1,31 +1,27 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd # pandas 的 DataFrame 可以將一筆筆資料以表格形式組織起來，方便以欄與列的結構來操作和分析資料。
-from tabulate import tabulate # tabulate 可以調整原終端機輸出的表格畫面，變得更整齊易讀。
+from typing import Optional
+# bs4、pandas、tabulate 載入較慢，改在函式內用到時才匯入，讓 import veggie_w1 不會拖慢網頁與排程啟動。
 from wcwidth import wcswidth # wcswidth（text）會回傳整段文字在終端機中的實際顯示寬度。英文字母、數字：寬度 1，中文：寬度 2。
+from veggie_http import http_get, site_url # 共用的 HTTP 用戶端。
+from veggie_parse import parse_price_cards # 快速的網頁解析。
+from veggie_metrics import get_metrics # 各階段耗時。
 
 
+@get_metrics().timed("scrape")
 def scrape_tw_food_top5(url) -> list[dict]:
     """1.爬蟲函式：從網頁（參數）抓取推薦前五名的品項名稱、批發價、零售價。"""
-    # 先設定 User-Agent：隱藏爬蟲目的的假身分，讓網站以為你只是用你的設備（假身分）在上網。
-    # 設備：Windows 10 / 64 位元作業系統 / Chrome 瀏覽器 v85。
+    # 共用的 HTTP 用戶端已設定 User-Agent：隱藏爬蟲目的的假身分，讓網站以為你只是用你的設備（假身分）在上網。
+    # 並且會重複使用連線、設定逾時，遇到連線錯誤或伺服器錯誤時自動重試。
     try:
-        # 使用假身分自我介紹，取得網頁內容。
-        headers = {
-            'User-Agent': (
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                'AppleWebKit/537.36 (KHTML, like Gecko) '
-                'Chrome/85.0.4183.83 Safari/537.36'
-            ),
-        }
-        res = requests.get(url, headers=headers) 
+        res = http_get(url)
+        res.raise_for_status()
     except Exception as e:
         print(f"爬取失敗：{url} → {e}")
         return list()
 
     # 尋找網頁全部品項，即推薦排行榜前五名的各品項資料（名稱、批發價、零售價等），並以串列 list 存放。
     # 每個品項的大結構為<div class="col-xs-6 col-sm-6 col-md-12 vege_price">。
-    food_top5 = BeautifulSoup(res.text, 'html.parser').find_all('div', class_='vege_price') # 放寬匹配條件降低尋找失誤。
+    # 只解析這些區塊（有安裝 lxml 時使用 lxml），其餘網頁內容略過。
+    food_top5 = parse_price_cards(res.text) # 放寬匹配條件降低尋找失誤。
 
     # 各品項處理。
     items_data = []
@@ -51,64 +47,109 @@ def scrape_tw_food_top5(url) -> list[dict]:
     return items_data
 
 
-def apply_url_dataframe():
-    """2.應用函式：將蔬菜與水果分頁丟進爬蟲函式，並建立 DataFrame。"""
+# 「合理價格區間」= 本週平均批發價 + (預估零售價-本週平均批發價) × [25%, 75%]。
+PRICE_RANGE_RATIO = (0.25, 0.75)
+
+
+def build_price_dataframe(items_data: list[dict]):
+    """
+    建立品項價格 DataFrame，並以整欄運算（不逐列迴圈）新增數值欄位「合理價下限」、「合理價上限」。
+    品項數量不限，可以是前五名，也可以是整個蔬果目錄。
+    """
+    import pandas as pd # pandas 的 DataFrame 可以將一筆筆資料以表格形式組織起來，方便以欄與列的結構來操作和分析資料。
+
+    df = pd.DataFrame(items_data, columns=['名稱', '平均批發價(元/台斤)', '預估零售價(元/台斤)'])
+    wholesale = df['平均批發價(元/台斤)'].astype(float)
+    spread = df['預估零售價(元/台斤)'].astype(float) - wholesale
+
+    low_ratio, high_ratio = PRICE_RANGE_RATIO
+    df['合理價下限'] = wholesale + spread * low_ratio
+    df['合理價上限'] = wholesale + spread * high_ratio
+    return df
+
+
+def format_price_dataframe(df):
+    """顯示用：把合理價下限、上限合併成「合理價區間」文字，並統一欄位名稱與寬度。"""
+    # 推薦引擎的排行榜沒有零售價，直接顯示名稱、均價與折扣。
+    if '合理價下限' not in df.columns:
+        return df.drop(columns=['代碼'], errors='ignore')
+
+    display = df[['名稱', '平均批發價(元/台斤)', '預估零售價(元/台斤)']].copy()
+    # .1f 代表顯示到小數點後一位。
+    display['合理價格區間'] = (
+        df['合理價下限'].map('{:.1f}'.format).astype(str) + " - " + df['合理價上限'].map('{:.1f}'.format).astype(str)
+    )
+
+    # 簡化欄位名稱。
+    display.rename(columns={
+        '名稱': '名稱',
+        '平均批發價(元/台斤)': '平均批發價',
+        '預估零售價(元/台斤)': '預估零售價',
+        '合理價格區間': '合理價區間'
+    }, inplace=True)
+
+    # 寬度調整函式：依照目標寬度參數 width 補齊文字參數 text 寬度。
+    def pad_text(text, width):
+        pad = width - wcswidth(text)
+        return text + ' ' * pad if pad > 0 else text
+    # 將 DataFrame 各欄位丟進寬度調整函式，統一顯示寬度（自訂 10 寬度）。
+    display.columns = [pad_text(col, 10) for col in display.columns]
+    return display
+
+
+@get_metrics().timed("recommend")
+def apply_url_dataframe(top_n: Optional[int] = None):
+    """
+    2.應用函式：將蔬菜與水果分頁丟進爬蟲函式，並建立 DataFrame。
+    回傳的 DataFrame 保留數值欄位，顯示前再用 format_price_dataframe() 轉成表格文字。
+    指定 top_n 時改用本地推薦引擎：從整個目錄中挑出比自己近一年平均便宜最多的前 top_n 名。
+    """
+    if top_n is not None:
+        import pandas as pd # pandas 的 DataFrame 可以將一筆筆資料以表格形式組織起來，方便以欄與列的結構來操作和分析資料。
+        from veggie_recommend import get_recommend_engine # 本地推薦引擎。
+
+        engine = get_recommend_engine()
+        return (
+            pd.DataFrame(engine.top_n(top_n, kind="vege")),
+            pd.DataFrame(engine.top_n(top_n, kind="fruit")),
+        )
 
     # 蔬菜前五名分頁網址。
-    url_veg = 'https://www.twfood.cc/vege'
+    url_veg = site_url('/vege')
     # 水果前五名分頁網址。
-    url_fruit = 'https://www.twfood.cc/fruit'
+    url_fruit = site_url('/fruit')
     
     # 丟進爬蟲函式取得字典串列 list。
     list_veg = scrape_tw_food_top5(url_veg)
     list_fruit = scrape_tw_food_top5(url_fruit)
 
-    # 建立 DataFrame。
-    df_veg = pd.DataFrame(list_veg)
-    df_fruit = pd.DataFrame(list_fruit)
-
-    for df in (df_veg, df_fruit):
-        # 新增「合理價格區間」欄位，並針對每一品項計算「合理價格區間」= 本週平均批發價 + (預估零售價-本週平均批發價) × [25%, 75%]。
-        df['合理價格區間'] = df.apply(
-            lambda row: f"{(row['平均批發價(元/台斤)'] + (row['預估零售價(元/台斤)'] - row['平均批發價(元/台斤)'])*0.25):.1f}"
-                        + " - " + 
-                        f"{(row['平均批發價(元/台斤)'] + (row['預估零售價(元/台斤)'] - row['平均批發價(元/台斤)'])*0.75):.1f}", # .1f 代表顯示到小數點後一位。
-            axis=1
-        )
-        
-        # 簡化欄位名稱。
-        df.rename(columns={
-            '名稱': '名稱',
-            '平均批發價(元/台斤)': '平均批發價',
-            '預估零售價(元/台斤)': '預估零售價',
-            '合理價格區間': '合理價區間'
-        }, inplace=True)
-
-        # 寬度調整函式：依照目標寬度參數 width 補齊文字參數 text 寬度。
-        def pad_text(text, width):
-            pad = width - wcswidth(text)
-            return text + ' ' * pad if pad > 0 else text
-        # 將 DataFrame 各欄位丟進寬度調整函式，統一顯示寬度（自訂 10 寬度）。
-        df.columns = [pad_text(col, 10) for col in df.columns]
-
-    return df_veg, df_fruit
-
-
-# 3.輸出：執行應用函式後，設定表格的美化格式並輸出。
-df_veg, df_fruit = apply_url_dataframe()
-
-print("蔬菜排行榜前五名(元/台斤):")
-table_veg = tabulate(df_veg, headers='keys', tablefmt='github', floatfmt=".1f", stralign="center", numalign="decimal", showindex=False)
-table_veg = table_veg.replace(
-    "|--------------|--------------|--------------|--------------|",
-    "|:------------:|:------------:|:------------:|:------------:|"
-)
-print(table_veg)
-
-print("\n水果排行榜前五名(元/台斤):")
-table_fruit = tabulate(df_fruit, headers='keys', tablefmt='github', floatfmt=".1f", stralign="center", numalign="decimal", showindex=False)
-table_fruit = table_fruit.replace(
-    "|--------------|--------------|--------------|--------------|",
-    "|:------------:|:------------:|:------------:|:------------:|"
-)
-print(table_fruit)
+    # 建立 DataFrame 並計算合理價格區間。
+    return build_price_dataframe(list_veg), build_price_dataframe(list_fruit)
+
+
+def main():
+    """3.輸出：執行應用函式後，設定表格的美化格式並輸出。"""
+    from tabulate import tabulate # tabulate 可以調整原終端機輸出的表格畫面，變得更整齊易讀。
+
+    df_veg, df_fruit = map(format_price_dataframe, apply_url_dataframe())
+
+    print("蔬菜排行榜前五名(元/台斤):")
+    table_veg = tabulate(df_veg, headers='keys', tablefmt='github', floatfmt=".1f", stralign="center", numalign="decimal", showindex=False)
+    table_veg = table_veg.replace(
+        "|--------------|--------------|--------------|--------------|",
+        "|:------------:|:------------:|:------------:|:------------:|"
+    )
+    print(table_veg)
+
+    print("\n水果排行榜前五名(元/台斤):")
+    table_fruit = tabulate(df_fruit, headers='keys', tablefmt='github', floatfmt=".1f", stralign="center", numalign="decimal", showindex=False)
+    table_fruit = table_fruit.replace(
+        "|--------------|--------------|--------------|--------------|",
+        "|:------------:|:------------:|:------------:|:------------:|"
+    )
+    print(table_fruit)
+
+
+# 直接執行本檔案（python veggie_w1.py）才會爬取並輸出；被匯入時不會有任何副作用。
+if __name__ == "__main__":
+    main()
@@ -11,22 +11,23 @@ class WeightUnit(StrEnum):
     KILOGRAM = '公斤'
 
 
+# 設定字典：每人每日應攝取蔬菜量，每份蔬菜 100 克（單筆與批次換算共用）。
+UNIT_DAILY_GRAMS = {
+    Category.CHILD: 3 * 100,   # 300 克。
+    Category.FEMALE: 4 * 100,  # 400 克。
+    Category.MALE: 5 * 100     # 500 克。
+}
+
+
 def unit_conversion(child_count: int, female_count: int, male_count: int, days: int):
     """1.單位換算函式：計算各類人數的應攝取蔬菜總量（公克），換算成蔬菜的應購買總量（公斤、台斤）。"""
     # 四個參數：12 歲以下兒童人數 child_count 、12歲以上女性人數 female_count 、12歲以上男性人數 male_count 及單次須購買的蔬菜份量天數 days 。
-    # 設定字典：每人每日應攝取蔬菜量，每份蔬菜 100 克。
-    unit_daily_grams = {
-        Category.CHILD: 3 * 100,   # 300 克。
-        Category.FEMALE: 4 * 100,  # 400 克。
-        Category.MALE: 5 * 100     # 500 克。
-    }
-
     # 使用字典，計算各類人數的應攝取蔬菜總量（公克）。
     # 各類人數的應攝取蔬菜總量 = 各類人數的每日總應攝取蔬菜量 x 單次須購買的蔬菜份量天數。
     total_days_grams = (
-        child_count * unit_daily_grams[Category.CHILD] +
-        female_count * unit_daily_grams[Category.FEMALE] +
-        male_count * unit_daily_grams[Category.MALE]
+        child_count * UNIT_DAILY_GRAMS[Category.CHILD] +
+        female_count * UNIT_DAILY_GRAMS[Category.FEMALE] +
+        male_count * UNIT_DAILY_GRAMS[Category.MALE]
     ) * days
 
     # 將公克換算成公斤與台斤，每 600 公克等於 1 台斤。
@@ -42,6 +43,65 @@ def unit_conversion(child_count: int, female_count: int, male_count: int, days:
     }
 
 
+def unit_conversion_batch(child_count, female_count, male_count, days):
+    """
+    1-1.批次單位換算函式：參數可以是整數或陣列（例如 DataFrame 的欄位），一次計算多個家庭或據點的蔬菜應購買總量。
+    回傳 {公斤: 陣列, 台斤: 陣列}，計算方式與 1.單位換算函式 相同。
+    """
+    import numpy as np
+
+    # 整欄一次運算，不逐筆迴圈。
+    total_days_grams = (
+        np.asarray(child_count, dtype=float) * UNIT_DAILY_GRAMS[Category.CHILD] +
+        np.asarray(female_count, dtype=float) * UNIT_DAILY_GRAMS[Category.FEMALE] +
+        np.asarray(male_count, dtype=float) * UNIT_DAILY_GRAMS[Category.MALE]
+    ) * np.asarray(days, dtype=float)
+
+    return {
+        WeightUnit.KILOGRAM: np.round(total_days_grams / 1000, 2),
+        WeightUnit.TAI_JIN: np.round(total_days_grams / 600, 2)
+    }
+
+
+def plan_households(households, prices=None):
+    """
+    1-2.批次採購規劃函式：households 為 DataFrame，欄位 child_count、female_count、male_count、days（每列一個家庭或據點）。
+    新增「公斤」、「台斤」欄位，並依目前的合理價格區間（元/台斤）估算每列的花費區間「預估花費下限」、「預估花費上限」。
+    prices 為第一週檔案 build_price_dataframe() 格式的價格表，不指定則使用本週蔬菜推薦排行榜。
+    若 households 有「名稱」欄位，依品項名稱對應價格；否則使用價格表的平均價格。
+    """
+    import pandas as pd
+
+    plan = households.copy()
+    totals = unit_conversion_batch(
+        plan['child_count'], plan['female_count'], plan['male_count'], plan['days']
+    )
+    plan[WeightUnit.KILOGRAM.value] = totals[WeightUnit.KILOGRAM]
+    plan[WeightUnit.TAI_JIN.value] = totals[WeightUnit.TAI_JIN]
+
+    if prices is None:
+        # 用到時才匯入：只有估算花費時才需要爬取價格。
+        from veggie_w1 import apply_url_dataframe
+        prices, _ = apply_url_dataframe()
+    if prices.empty:
+        return plan
+
+    if '名稱' in plan.columns:
+        # 依品項名稱對應價格（沒有對應到的品項花費為空值）。
+        unit_prices = prices.set_index('名稱')[['合理價下限', '合理價上限']]
+        unit_prices = unit_prices[~unit_prices.index.duplicated()]
+        low = plan['名稱'].map(unit_prices['合理價下限'])
+        high = plan['名稱'].map(unit_prices['合理價上限'])
+    else:
+        # 綜合蔬菜：使用價格表的平均合理價格區間。
+        low = pd.Series(prices['合理價下限'].mean(), index=plan.index)
+        high = pd.Series(prices['合理價上限'].mean(), index=plan.index)
+
+    plan['預估花費下限'] = (plan[WeightUnit.TAI_JIN.value] * low).round(0)
+    plan['預估花費上限'] = (plan[WeightUnit.TAI_JIN.value] * high).round(0)
+    return plan
+
+
 # 🍹主程式🍹。
 def user_input():
     """2.使用者輸入函式：先執行 2.確認輸入函式 ，讓使用者輸入人數與天數後，再執行 1.單位換算函式 並輸出（見上方）。"""
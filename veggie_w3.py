@@ -1,15 +1,18 @@
-from typing import Optional, List
-from dataclasses import dataclass
+from typing import Iterator, Optional, List, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import time
+import queue
 import traceback
-import requests
-from bs4 import BeautifulSoup
 import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
 import re # 正規表達式模組，用來進行文字比對與格式驗證。
-from selenium import webdriver # 用來控制瀏覽器自動化操作。
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+from veggie_http import http_get, site_url, get_circuit_breaker, endpoint_name, CircuitOpenError # 共用的 HTTP 用戶端（連線池、逾時、重試、斷路器）。
+from veggie_parse import parse_first_search_link # 快速的網頁解析。
+from veggie_cache import get_code_cache, get_failure_cache # 水果代碼的硬碟快取與查詢失敗負快取。
+from veggie_price_store import get_price_store # 本地的每週成交價資料庫。
+from veggie_rules import low_streak
+from veggie_metrics import get_metrics # 各階段耗時與快取命中率。
 
 
 @dataclass
@@ -18,6 +21,10 @@ class FruitInfo:
     average_price: float
     year_average_price: float
     lower_than_average: bool
+    # 最新一週是最近幾週的最低價（含最新一週），用於「N 週最低價」通知規則。
+    low_streak_weeks: Optional[int] = None
+    # 開啟瀏覽器比對時，Selenium 讀到的「全年度平均成交價」，用來確認兩種算法結果一致。
+    browser_year_average_price: Optional[float] = None
 
 @dataclass
 class FruitSearchResult:
@@ -25,45 +32,117 @@ class FruitSearchResult:
     message: str
     data: Optional[FruitInfo] = None
     errors: Optional[list[str]] = None
+    # 各階段耗時（秒），例如 {"fruit_code": 0.12, "fruit_price": 0.34}。
+    timings: dict[str, float] = field(default_factory=dict)
 
 class FruitSearchException(Exception):
     def __init__(
             self,
             message: str,
-            exc_stack: Optional[List[str]] = None
+            exc_stack: Optional[List[str]] = None,
+            transient: bool = False,
         ):
         super().__init__(message)
         self.message = message
         self.exc_stack = exc_stack
+        # transient=True 代表連線失敗、逾時等暫時性錯誤，不寫入失敗負快取。
+        self.transient = transient
 
 
-def get_fruit_code(fruit_name):
+class Deadline:
+    """
+    整體查詢的時間預算（秒）。各階段用 timeout() 取得剩餘時間作為逾時秒數，
+    時間用完時丟出 FruitSearchException("查詢逾時")。
+    """
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, share: float = 1.0, default: Optional[float] = None) -> float:
+        """取得這個階段可用的秒數：剩餘時間 × share，且不超過 default。"""
+        if self.expired:
+            raise FruitSearchException("查詢逾時", transient=True)
+        seconds = self.remaining() * share
+        return min(seconds, default) if default else seconds
+
+    def sub(self, share: float) -> "Deadline":
+        """分給某個階段的時間預算：剩餘時間 × share。"""
+        return Deadline(self.remaining() * share)
+
+
+def _stage_shares(verify_with_browser: bool) -> tuple[float, float]:
+    """各階段可用的時間比例（剩餘時間的比例）：取得代碼、每週成交價，剩下的留給瀏覽器比對。"""
+    return (0.3, 0.5) if verify_with_browser else (0.5, 1.0)
+
+
+@get_metrics().timed("fruit_code")
+def get_fruit_code(fruit_name, use_cache: bool = True, timeout: Optional[float] = None):
     """
     取得水果代碼。
+    查過的名稱會存在硬碟快取（含找不到的名稱），重複查詢時不必再連線搜尋。
+    """
+    cache = get_code_cache()
+    cached = cache.get(fruit_name) if use_cache else None
+    get_metrics().cache_result("fruit_code", hit=cached is not None)
+    if cached:
+        if not cached["code"]:
+            raise FruitSearchException("Target element not found")
+        return cached["code"], cached["href"]
+
+    try:
+        fruit_code, href = _search_fruit_code(fruit_name, timeout=timeout)
+    except FruitSearchException as e:
+        # 只記錄「找不到」，連線失敗等暫時性錯誤不寫入快取。
+        if e.message == "Target element not found":
+            cache.set_missing(fruit_name)
+        raise
+
+    if fruit_code:
+        cache.set(fruit_name, fruit_code, href)
+    return fruit_code, href
+
+
+def invalidate_fruit_code(fruit_name: Optional[str] = None):
+    """清除水果代碼快取與查詢失敗負快取；不指定水果名稱則全部清除。"""
+    get_code_cache().invalidate(fruit_name)
+    get_failure_cache().invalidate(fruit_name)
+
+
+def _search_fruit_code(fruit_name, timeout: Optional[float] = None):
+    """
+    到網站搜尋水果代碼。
     """
-    url = "https://www.twfood.cc/search"
+    url = site_url("/search")
     params = {"q": fruit_name}
 
     try:
-        res = requests.get(url, params=params, timeout=10)
+        # 有逾時上限時（整體時間預算）不自動重試，時間到之後不再對網站送出請求。
+        res = http_get(url, params=params, timeout=timeout or 10, retry=timeout is None)
         res.raise_for_status()
     except Exception as e:
         raise FruitSearchException(
             "爬取水果代碼失敗",
             exc_stack=traceback.format_exception(e),
+            transient=True,
         )
 
     try:
-        soup = BeautifulSoup(res.text, "html.parser")
-        # 找出 div.blog-posts 裡第一個 <a> 超連結。
-        link = soup.select_one("div.blog-posts a")
+        # 找出 div.blog-posts 裡第一個 <a> 超連結（串流解析，找到就停止）。
+        link = parse_first_search_link(res.text)
     except Exception as e:
         raise FruitSearchException(
             "解析水果代碼失敗",
             exc_stack=traceback.format_exception(e),
         )
     
-    if not (link and "href" in link.attrs):
+    if not (link and "href" in link):
         raise FruitSearchException("Target element not found")
 
     if "/fruit/" not in (href := link.get("href")):
@@ -75,37 +154,136 @@ def get_fruit_code(fruit_name):
     return fruit_code, href
 
 
-def get_fruit_price(fruit_code):
+# 年度統計需要的週數（一年約 52 週）。
+YEAR_WINDOW_WEEKS = 52
+# 只請求需要的欄位，讓回應大小不隨歷史資料增加。
+WEEK_FIELDS = {"itemCode": True, "endDay": True, "avgPrice": True}
+
+
+def _weeks_ago(weeks: int) -> str:
+    """回傳 weeks 週前的日期字串，格式與 API 的週期相同（例如 "2024/01/05"）。"""
+    return (datetime.now() - timedelta(weeks=weeks)).strftime("%Y/%m/%d")
+
+
+def _fetch_weeks(where: dict, limit: Optional[int] = None, timeout: Optional[float] = None) -> list[dict]:
     """
-    取得水果「每週成交價」。
-    「每週成交價」：週期 endDay、成交價 avgPrice。
+    向網站 API 下載符合條件的「每週成交價」。
+    由新到舊排序、限制筆數並只取 endDay、avgPrice、itemCode 欄位。
     """
-    url = "https://www.twfood.cc/api/FarmTradeSumWeeks"
+    url = site_url("/api/FarmTradeSumWeeks")
     params = {
-        "order": "endDay asc",
-        "where": {
-            "itemCode": fruit_code,
-            "startDay": {"gte": "2023/12/29"}
-        }
+        "order": "endDay desc",
+        "fields": WEEK_FIELDS,
+        "where": where,
     }
+    if limit:
+        params["limit"] = limit
 
     try:
         # json.dumps()：把 Python 物件變成 JSON 字串。
-        res = requests.get(url, params={"filter": json.dumps(params)})
+        # 有逾時上限時（整體時間預算）不自動重試，時間到之後不再對網站送出請求。
+        res = http_get(url, params={"filter": json.dumps(params)}, timeout=timeout, retry=timeout is None)
         res.raise_for_status() # 檢查請求是否成功。
         data = res.json() # 把 JSON 字串變成 Python 物件。
     except Exception as e:
         raise FruitSearchException(
             "爬取每週成交價失敗",
             exc_stack=traceback.format_exception(e),
+            transient=True,
         )
     
-    # 確認 data 是串列且不是空的。
-    if not isinstance(data, list) or not data:
+    # 確認 data 是串列。
+    if not isinstance(data, list):
         raise FruitSearchException("資料錯誤：回傳非串列或為空")
-    
+
+    return data
+
+
+@get_metrics().timed("fruit_price")
+def sync_fruit_weeks(
+        fruit_codes: Sequence[str],
+        chunk_size: int = 50,
+        window: int = YEAR_WINDOW_WEEKS,
+        deadline: Optional[Deadline] = None,
+    ) -> dict[str, FruitSearchException]:
+    """
+    批次更新多個水果的「每週成交價」到本地資料庫。
+    同一批代碼用 inq 條件合併成一次請求，每個代碼最多只下載最近 window 週，回傳下載失敗的代碼與錯誤。
+    """
+    store = get_price_store()
+    codes = list(dict.fromkeys(code for code in fruit_codes if code)) # 去除重複並保留順序。
+
+    # 資料庫已有資料的代碼只取更新的週次，並依最新週期分組（同一組的起始週期相同，
+    # 不會因為一個很久沒有交易的品項而重抓其他品項已經有的週次）；沒有資料的代碼下載最近 window 週。
+    latest_days = {code: store.latest_end_day(code) for code in codes}
+    groups = {}
+    for code in codes:
+        groups.setdefault(latest_days[code], []).append(code)
+        get_metrics().cache_result("price_store", hit=bool(latest_days[code]))
+
+    failed = {}
+    for latest_day, group in groups.items():
+        for i in range(0, len(group), chunk_size):
+            chunk = group[i:i + chunk_size]
+            where = {"itemCode": chunk[0] if len(chunk) == 1 else {"inq": chunk}}
+            if latest_day:
+                where["endDay"] = {"gt": latest_day}
+            else:
+                where["endDay"] = {"gte": _weeks_ago(window)}
+
+            try:
+                # 每個代碼在範圍內最多 window + 1 週，據此限制筆數。
+                timeout = deadline.timeout() if deadline else None
+                rows = _fetch_weeks(where, limit=(window + 1) * len(chunk), timeout=timeout)
+            except FruitSearchException as e:
+                failed.update(dict.fromkeys(chunk, e))
+                continue
+
+            # 依代碼分組後寫入資料庫。
+            grouped = {code: [] for code in chunk}
+            for row in rows:
+                code = row.get("itemCode") or (chunk[0] if len(chunk) == 1 else None)
+                if code in grouped:
+                    grouped[code].append(row)
+            for code, weeks in grouped.items():
+                store.add_weeks(code, weeks)
+
+    return failed
+
+
+def fetch_latest_trade_day(fruit_codes: Sequence[str]) -> Optional[str]:
+    """
+    只詢問網站這些水果最新一筆成交的週期（endDay，只取 1 筆），用來判斷有沒有新的一週資料。
+    沒有任何成交資料時回傳 None。
+    """
+    codes = list(dict.fromkeys(code for code in fruit_codes if code))
+    if not codes:
+        return None
+    rows = _fetch_weeks({"itemCode": codes[0] if len(codes) == 1 else {"inq": codes}}, limit=1)
+    return rows[0].get("endDay") if rows else None
+
+
+def get_fruit_weeks(fruit_code, deadline: Optional[Deadline] = None) -> list[dict]:
+    """
+    取得水果「每週成交價」的完整資料（依週期由舊到新排列）。
+    資料存在本地資料庫，只向網站下載比資料庫最新週期更新的週次。
+    """
+    if error := sync_fruit_weeks([fruit_code], deadline=deadline).get(fruit_code):
+        raise error
+
+    # 確認資料庫裡有資料。
+    if not (weeks := get_price_store().get_weeks(fruit_code)):
+        raise FruitSearchException("資料錯誤：回傳非串列或為空")
+
+    return weeks
+
+
+def get_latest_price(weeks: list[dict]):
+    """
+    從「每週成交價」資料取出最新一週的週期與成交價。
+    """
     # 取最後一筆（最新的一週）。
-    latest = data[-1]
+    latest = weeks[-1]
     avg_price = latest.get("avgPrice")
     period = latest.get("endDay")
 
@@ -115,44 +293,99 @@ def get_fruit_price(fruit_code):
     return avg_price, period
 
 
-def get_fruit_year_price(href: str) -> float:
+def calc_fruit_year_price(weeks: list[dict], window: int = YEAR_WINDOW_WEEKS) -> float:
     """
-    取得水果「全年度平均成交價」。
+    用「每週成交價」計算水果「全年度平均成交價」。
+    以最新一週的週期往前推 window 週（預設 52 週，含最新一週），取期間內各週成交價的平均。
     """
-    base = "https://www.twfood.cc"
-    url = base + href
+    try:
+        # 週期格式為 "2024/01/05"。
+        dated = [
+            (datetime.strptime(week["endDay"], "%Y/%m/%d"), float(week["avgPrice"]))
+            for week in weeks
+            if week.get("endDay") and week.get("avgPrice")
+        ]
+    except (TypeError, ValueError) as e:
+        raise FruitSearchException(
+            "解析每週成交價失敗",
+            exc_stack=traceback.format_exception(e),
+        )
 
-    # 模擬真實瀏覽器。
-    options = webdriver.ChromeOptions()
-    options.add_argument("--disable-gpu")
-    
-    # 啟動瀏覽器。
-    driver = webdriver.Chrome(options=options)
+    if not dated:
+        raise FruitSearchException("資料錯誤：沒有可計算的每週成交價")
+
+    # 只取最近 window 週的週期（往前推 365 天會多包含一週，變成 53 週）。
+    since = max(day for day, _ in dated) - timedelta(weeks=window)
+    prices = [price for day, price in dated if day > since]
 
+    return round(sum(prices) / len(prices), 2)
+
+
+def _scrape_year_price_texts(url: str, timeout: float) -> list[str]:
+    """用瀏覽器開啟水果頁面，讀取圖表中含有「全年度平均成交價」的文字。"""
+    # Selenium 只有比對時才需要，用到時才匯入，加快程式啟動。
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException
+    from veggie_browser import get_browser_pool # 共用的無頭瀏覽器池。
+
+    # 瀏覽器也有自己的斷路器：網站連續逾時就先不開頁面，直接失敗。
+    breaker = get_circuit_breaker("browser:" + endpoint_name(url).split("/", 1)[0])
     try:
-        driver.get(url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "tspan"))
-        )
+        breaker.before_call()
+    except CircuitOpenError as e:
+        raise FruitSearchException(str(e), transient=True)
 
-        target_spans = filter(
-            lambda span: "全年度平均成交價" in span.text,
-            driver.find_elements(By.TAG_NAME, "tspan"),
-        )
-        
-        target_texts = list(map(
-            lambda span: span.text,
-            target_spans,
-        ))
+    # 向共用的瀏覽器池借用瀏覽器，用完歸還，不必每次重新啟動 Chrome。
+    # 等待空閒瀏覽器與等待頁面元素共用同一個逾時秒數。
+    started = time.monotonic()
+    try:
+        with get_browser_pool().driver(timeout=timeout) as driver:
+            driver.get(url)
+            WebDriverWait(driver, max(0.0, timeout - (time.monotonic() - started))).until(
+                EC.presence_of_element_located((By.TAG_NAME, "tspan"))
+            )
+
+            target_spans = filter(
+                lambda span: "全年度平均成交價" in span.text,
+                driver.find_elements(By.TAG_NAME, "tspan"),
+            )
+            
+            target_texts = list(map(
+                lambda span: span.text,
+                target_spans,
+            ))
+    except queue.Empty:
+        # 瀏覽器都在使用中：不是網站的問題，不計入斷路器。
+        raise FruitSearchException("查詢逾時：等待瀏覽器", transient=True)
     except TimeoutException:
-        raise FruitSearchException("Timeout when scraping tspan")
+        breaker.record_failure()
+        raise FruitSearchException("Timeout when scraping tspan", transient=True)
     except Exception as e:
+        breaker.record_failure()
         raise FruitSearchException(
             "Error in scraping fruit year price",
             exc_stack=traceback.format_exception(e),
+            transient=True,
         )
-    finally:
-        driver.quit()
+    breaker.record_success()
+    return target_texts
+
+
+@get_metrics().timed("year_price_browser")
+def get_fruit_year_price(href: str, timeout: float = 10) -> float:
+    """
+    取得水果「全年度平均成交價」。
+    """
+    from veggie_replay import chart_texts, ReplayMissError # 錄製或重播圖表文字。
+
+    url = site_url(href)
+    try:
+        # 重播模式直接讀取錄製的文字，不會啟動瀏覽器。
+        target_texts = chart_texts(url, lambda: _scrape_year_price_texts(url, timeout))
+    except ReplayMissError as e:
+        raise FruitSearchException(str(e), transient=True)
 
     if not target_texts:
         raise FruitSearchException("Tspan element not found")
@@ -163,28 +396,329 @@ def get_fruit_year_price(href: str) -> float:
     return float(match.group(1))
 
 
-def search(fruit_name: str) -> FruitSearchResult:
-    """整合查詢函式：內含上述三個函式。"""
+def search(
+        fruit_name: str,
+        verify_with_browser: bool = False,
+        deadline: Optional[float] = None,
+    ) -> FruitSearchResult:
+    """
+    整合查詢函式：內含上述函式。
+    「全年度平均成交價」預設由每週成交價直接計算，不需啟動瀏覽器；
+    verify_with_browser=True 時會另外用 Selenium 讀取網頁上的數值，方便比對兩種算法。
+    最近查詢失敗過（非連線問題）的水果會直接回傳上次的錯誤，不再連線。
+    deadline 為整體查詢最多花費的秒數，超過時回傳附逾時原因的結果。
+    """
+    if deadline is not None:
+        return search_many([fruit_name], verify_with_browser=verify_with_browser, deadline=deadline)[0]
+
+    return _search_one(fruit_name, verify_with_browser)
+
+
+def _search_one(
+        fruit_name: str,
+        verify_with_browser: bool = False,
+        deadline: Optional[Deadline] = None,
+        stages: Optional[dict[str, str]] = None,
+    ) -> FruitSearchResult:
+    """
+    單一水果的完整查詢流程，各階段耗時記錄在 result.timings。
+    stages 不是 None 時記錄目前進行到的階段（{水果名稱: 階段}），呼叫端逾時時可以註明停在哪個階段。
+    """
+    with get_metrics().timer("search"), get_metrics().collect({}) as timings:
+        if not (result := _cached_failure(fruit_name)):
+            result = _search_stages(fruit_name, verify_with_browser, deadline, {} if stages is None else stages)
+    result.timings = timings
+    return result
+
+
+def _search_stages(
+        fruit_name: str,
+        verify_with_browser: bool,
+        deadline: Optional[Deadline],
+        stages: dict[str, str],
+    ) -> FruitSearchResult:
+    """依序執行各階段；與 search_many 相同，依階段分配時間預算，逾時的階段回傳附逾時原因的結果。"""
+    shares = _stage_shares(verify_with_browser)
+    stages[fruit_name] = "取得水果代碼"
+    code_budget = deadline.sub(shares[0]) if deadline else None
     try:
-        fruit_code, href = get_fruit_code(fruit_name)
-        avg_price, period = get_fruit_price(fruit_code)
-        year_price = get_fruit_year_price(href)
-
-        fruit_info = FruitInfo(
-            period=period,
-            average_price=avg_price,
-            year_average_price=year_price,
-            lower_than_average=year_price > avg_price
-        )
+        fruit_code, href = get_fruit_code(fruit_name, timeout=code_budget.timeout(default=10) if code_budget else None)
+    except FruitSearchException as e:
+        return _stage_error_result(fruit_name, e, "取得水果代碼", code_budget)
 
-        return FruitSearchResult(
-            fruit = fruit_name,
-            message = "success",
-            data = fruit_info
-        )
+    stages[fruit_name] = "每週成交價"
+    price_budget = deadline.sub(shares[1]) if deadline else None
+    try:
+        weeks = get_fruit_weeks(fruit_code, deadline=price_budget)
+        if verify_with_browser:
+            stages[fruit_name] = "瀏覽器比對"
+        return _build_result(fruit_name, href, weeks, verify_with_browser, deadline)
     except FruitSearchException as e:
+        return _stage_error_result(fruit_name, e, "每週成交價", price_budget)
+
+
+def _build_result(
+        fruit_name: str,
+        href: str,
+        weeks: list[dict],
+        verify_with_browser: bool,
+        deadline: Optional[Deadline] = None,
+    ) -> FruitSearchResult:
+    """用每週成交價組合查詢結果。"""
+    avg_price, period = get_latest_price(weeks)
+    year_price = calc_fruit_year_price(weeks)
+
+    fruit_info = FruitInfo(
+        period=period,
+        average_price=avg_price,
+        year_average_price=year_price,
+        lower_than_average=year_price > avg_price,
+        low_streak_weeks=low_streak([week["avgPrice"] for week in weeks if week.get("avgPrice")]),
+    )
+    if verify_with_browser:
+        if deadline is not None and deadline.expired:
+            # 時間不夠比對：回傳已算好的部分結果。
+            return _timeout_result(fruit_name, "瀏覽器比對", fruit_info)
+        try:
+            fruit_info.browser_year_average_price = get_fruit_year_price(
+                href, timeout=deadline.timeout(default=10) if deadline else 10,
+            )
+        except FruitSearchException as e:
+            if deadline is not None and e.transient and deadline.expired:
+                return _timeout_result(fruit_name, "瀏覽器比對", fruit_info)
+            # 瀏覽器比對只是額外的檢查：失敗時保留由每週成交價算出的結果，也不寫入失敗負快取
+            # （否則之後不比對的一般查詢也會拿到這個錯誤）。
+            return FruitSearchResult(
+                fruit=fruit_name,
+                message=f"瀏覽器比對失敗：{e.message}",
+                data=fruit_info,
+                errors=e.exc_stack,
+            )
+
+    return FruitSearchResult(
+        fruit = fruit_name,
+        message = "success",
+        data = fruit_info
+    )
+
+
+def _finish_result(
+        fruit_name: str,
+        fruit_code: str,
+        href: str,
+        verify_with_browser: bool,
+        deadline: Optional[Deadline] = None,
+    ) -> FruitSearchResult:
+    """從本地資料庫讀取已同步的每週成交價並組合查詢結果。"""
+    if not (weeks := get_price_store().get_weeks(fruit_code)):
+        raise FruitSearchException("資料錯誤：回傳非串列或為空")
+    return _build_result(fruit_name, href, weeks, verify_with_browser, deadline)
+
+
+def _timeout_result(fruit_name: str, stage: str, data: Optional[FruitInfo] = None) -> FruitSearchResult:
+    """逾時的查詢結果：message 註明停在哪個階段，已完成的部分資料放在 data。"""
+    return FruitSearchResult(
+        fruit=fruit_name,
+        message=f"查詢逾時：{stage}未完成",
+        data=data,
+    )
+
+
+def _stage_error_result(
+        fruit_name: str,
+        e: FruitSearchException,
+        stage: Optional[str] = None,
+        stage_budget: Optional[Deadline] = None,
+    ) -> FruitSearchResult:
+    """階段失敗：這個階段的時間預算已用完（逾時造成的連線錯誤）時回傳逾時結果，否則照一般錯誤處理。"""
+    if stage and stage_budget is not None and e.transient and stage_budget.expired:
+        return _timeout_result(fruit_name, stage)
+    return _error_result(fruit_name, e)
+
+
+def _cached_failure(fruit_name: str) -> Optional[FruitSearchResult]:
+    """查詢失敗負快取：最近失敗過的水果回傳上次的錯誤，沒有則回傳 None。"""
+    message = get_failure_cache().get(fruit_name)
+    get_metrics().cache_result("failure", hit=message is not None)
+    if message:
+        return FruitSearchResult(fruit=fruit_name, message=message)
+    return None
+
+
+def _error_result(fruit_name: str, e: FruitSearchException) -> FruitSearchResult:
+    """
+    把查詢錯誤轉成 FruitSearchResult；非連線問題的錯誤（找不到水果代碼、沒有成交資料）寫入失敗負快取。
+    瀏覽器比對的錯誤不會經過這裡（見 _build_result）。
+    """
+    if not e.transient:
+        get_failure_cache().set(fruit_name, e.message)
+    return FruitSearchResult(
+        fruit=fruit_name,
+        message=e.message,
+        errors=e.exc_stack
+    )
+
+
+def _safe_call(
+        fruit_name: str,
+        func,
+        *args,
+        stage: Optional[str] = None,
+        stage_budget: Optional[Deadline] = None,
+    ) -> FruitSearchResult | tuple:
+    """包住查詢步驟：錯誤都轉成 FruitSearchResult，不影響其他水果；stage_budget 用完時回傳逾時結果。"""
+    try:
+        return func(*args)
+    except FruitSearchException as e:
+        return _stage_error_result(fruit_name, e, stage, stage_budget)
+    except Exception as e:
         return FruitSearchResult(
             fruit=fruit_name,
-            message=e.message,
-            errors=e.exc_stack
+            message=f"查詢錯誤：{e}",
+            errors=traceback.format_exception(e),
         )
+
+
+def search_many(
+        fruits: Sequence[str],
+        max_workers: int = 8,
+        verify_with_browser: bool = False,
+        chunk_size: int = 50,
+        deadline: Optional[float] = None,
+    ) -> list[FruitSearchResult]:
+    """
+    批次查詢函式：同時查詢多個水果，回傳順序與輸入相同。
+    水果代碼同時查詢，每週成交價則合併成一次（或分批的少數幾次）請求。
+    單一水果失敗只會反映在該水果的 FruitSearchResult，不會中斷整批查詢。
+    deadline 為整批查詢最多花費的秒數：時間依階段分配，超過時取消尚未完成的工作，
+    並回傳附逾時原因的部分結果。
+    """
+    fruits = list(fruits)
+    if not fruits:
+        return []
+
+    metrics = get_metrics()
+    started = time.perf_counter()
+    # 每種水果各階段的耗時，最後放進 result.timings。
+    timings = {fruit: {} for fruit in fruits}
+
+    budget = Deadline(deadline) if deadline is not None else None
+    shares = _stage_shares(verify_with_browser)
+
+    def run_stage(func, items, stage_budget):
+        """
+        同時執行一個階段；每個階段使用自己的執行緒，不會被前一階段逾時的工作卡住。
+        stage_budget 用完時還沒完成的項目回傳 None，並取消還沒開始的工作（已經在執行的請求由各自的逾時結束）。
+        """
+        # 執行緒數量不超過項目數量。
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+        try:
+            futures = [executor.submit(func, *item) for item in items]
+            wait(futures, timeout=stage_budget.remaining() if stage_budget else None)
+            return [future.result() if future.done() else None for future in futures]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # 1.同時取得所有水果代碼（最近失敗過的水果直接使用上次的錯誤）。
+    code_budget = budget.sub(shares[0]) if budget else None
+
+    def lookup(fruit):
+        if cached := _cached_failure(fruit):
+            return cached
+        with metrics.collect(timings[fruit]):
+            return _safe_call(
+                fruit,
+                lambda: get_fruit_code(fruit, timeout=code_budget.timeout(default=10) if code_budget else None),
+                stage="取得水果代碼",
+                stage_budget=code_budget,
+            )
+
+    codes = [
+        code or _timeout_result(fruit, "取得水果代碼")
+        for fruit, code in zip(fruits, run_stage(lookup, [(fruit,) for fruit in fruits], code_budget))
+    ]
+
+    # 2.一次批次更新所有水果的每週成交價。
+    found = {fruit: code for fruit, code in zip(fruits, codes) if isinstance(code, tuple)}
+    found_codes = [fruit_code for fruit_code, _ in found.values()]
+    sync_started = time.perf_counter()
+    sync_budget = budget.sub(shares[1]) if budget else None
+
+    def sync():
+        # 與 _safe_call 相同：任何錯誤（例如資料庫被鎖住）都轉成各代碼的失敗，不中斷整批查詢。
+        try:
+            return sync_fruit_weeks(found_codes, chunk_size=chunk_size, deadline=sync_budget)
+        except FruitSearchException as e:
+            return dict.fromkeys(found_codes, e)
+        except Exception as e:
+            error = FruitSearchException(f"查詢錯誤：{e}", exc_stack=traceback.format_exception(e), transient=True)
+            return dict.fromkeys(found_codes, error)
+
+    [failed] = run_stage(sync, [()], sync_budget)
+    # 每週成交價是整批一起下載，每種水果都記上這一批的耗時。
+    sync_seconds = round(time.perf_counter() - sync_started, 6)
+    for fruit in found:
+        timings[fruit]["fruit_price"] = sync_seconds
+    if failed is None:
+        failed = dict.fromkeys(found_codes, FruitSearchException("查詢逾時：每週成交價未完成", transient=True))
+
+    def finish(fruit_name, code):
+        if isinstance(code, FruitSearchResult):
+            return code
+        fruit_code, href = code
+        if error := failed.get(fruit_code):
+            return _stage_error_result(fruit_name, error, "每週成交價", sync_budget)
+        with metrics.collect(timings[fruit_name]):
+            return _safe_call(fruit_name, _finish_result, fruit_name, fruit_code, href, verify_with_browser, budget)
+
+    # 3.組合結果：從本地資料庫計算很快，直接處理；需要瀏覽器比對時則同時進行。
+    if not verify_with_browser:
+        results = [finish(fruit, code) for fruit, code in zip(fruits, codes)]
+    else:
+        results = [
+            result or _timeout_result(fruit, "瀏覽器比對")
+            for fruit, result in zip(fruits, run_stage(finish, list(zip(fruits, codes)), budget))
+        ]
+
+    for fruit, result in zip(fruits, results):
+        result.timings = timings[fruit]
+    metrics.observe("search_many", time.perf_counter() - started)
+    return results
+
+
+def iter_search(
+        fruits: Sequence[str],
+        max_workers: int = 8,
+        verify_with_browser: bool = False,
+        deadline: Optional[float] = None,
+    ) -> Iterator[tuple[int, FruitSearchResult]]:
+    """
+    邊查邊回傳的查詢函式：每種水果各自查詢（同時進行），哪種水果先查完就先回傳（在清單中的位置, 查詢結果）。
+    適合網頁逐一顯示結果；要一次取得全部結果時，search_many 合併請求的數量較少。
+    deadline 為整批查詢最多花費的秒數，時間到時尚未完成的水果回傳附逾時原因的結果。
+    """
+    fruits = list(fruits)
+    if not fruits:
+        return
+
+    budget = Deadline(deadline) if deadline is not None else None
+    # 各水果目前進行到的階段，逾時時用來註明停在哪個階段。
+    stages = {}
+    # 執行緒數量不超過水果數量。
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(fruits))))
+    futures = {
+        executor.submit(_safe_call, fruit, _search_one, fruit, verify_with_browser, budget, stages): i
+        for i, fruit in enumerate(fruits)
+    }
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=budget.remaining() if budget else None):
+            pending.discard(future)
+            yield futures[future], future.result()
+    except TimeoutError:
+        for future in pending:
+            i = futures[future]
+            yield i, future.result() if future.done() else _timeout_result(fruits[i], stages.get(fruits[i], "取得水果代碼"))
+    finally:
+        # 呼叫端提前停止或逾時：不等待執行中的工作，並取消還沒開始的工作。
+        executor.shutdown(wait=False, cancel_futures=True)
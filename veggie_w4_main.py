@@ -1,36 +1,71 @@
-from typing import Sequence
+import os
+from typing import Iterator, Sequence
 import streamlit as st # streamlit 是一個 Python 的開源框架，用來快速建立互動式網頁。
-from veggie_w1 import apply_url_dataframe # 匯入第一週檔案中的 2.應用函式。
+from veggie_w1 import apply_url_dataframe, format_price_dataframe # 匯入第一週檔案中的 2.應用函式與表格顯示函式。
 from veggie_w2 import unit_conversion, WeightUnit # 匯入第二週檔案中的 1.單位換算函式。
-from veggie_w3 import search, FruitSearchResult # 匯入第三週檔案中的 4.整合查詢函式。
+from veggie_w3 import iter_search, invalidate_fruit_code, FruitSearchResult # 匯入第三週檔案中的邊查邊回傳查詢函式。
+from veggie_cache import TTLCache # 記憶體中的 TTL 快取。
+from veggie_metrics import get_metrics # 快取命中率。
+from veggie_subscriptions import upsert_subscriber, find_subscriber # 多位訂閱者的喜愛水果清單。
 import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
 import re # 正規表達式模組，用來進行文字比對與格式驗證。
-from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
-import smtplib # Python 的內建郵件傳送模組，用來透過 SMTP 協定發送 Email。
-from email.mime.text import MIMEText # 建立純文字格式的 email 內容物件。
-from email.mime.multipart import MIMEMultipart # 建立多格式的 email 內容物件。
+from veggie_mail import Mailer, MailConfig, OutgoingMail # 批次寄信與寄件匣。
+
+
+# 快取設定：資料保存秒數與最多筆數，可用環境變數調整。
+CACHE_TTL = int(os.environ.get("VEGGIE_CACHE_TTL", 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("VEGGIE_CACHE_MAX_ENTRIES", 500))
+# 果價查詢最多等待的秒數，超過時顯示逾時原因。
+SEARCH_DEADLINE = float(os.environ.get("VEGGIE_SEARCH_DEADLINE", 20))
+
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_recommendations():
+    """
+    「精選蔬果」結果快取：所有使用者共用，TTL 內不會重新爬取網站。
+    爬取失敗（排行榜是空的）時丟出例外，st.cache_data 不會快取例外，下次會重新爬取。
+    """
+    df_veg, df_fruit = apply_url_dataframe()
+    if df_veg.empty or df_fruit.empty:
+        raise RuntimeError("推薦排行榜爬取失敗，請稍後再試")
+    return df_veg, df_fruit
+
+
+@st.cache_resource
+def search_result_cache() -> TTLCache:
+    """各水果查詢結果的快取：所有使用者共用（st.cache_resource 在整個程式只建立一次）。"""
+    return TTLCache(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
+
+
+def iter_cached_search(fruits: Sequence[str]) -> Iterator[tuple[int, FruitSearchResult]]:
+    """
+    先回傳有快取的結果，其餘水果同時查詢、查完一種就回傳一種（在清單中的位置, 查詢結果）。
+    只快取查詢成功的結果。
+    """
+    cache = search_result_cache()
+    misses = []
+    for i, fruit in enumerate(fruits):
+        result = cache.get(fruit)
+        get_metrics().cache_result("search_result", hit=result is not None)
+        if result is None:
+            misses.append(i)
+        else:
+            yield i, result
+
+    for j, result in iter_search([fruits[i] for i in misses], deadline=SEARCH_DEADLINE):
+        if result.message == "success":
+            cache.set(result.fruit, result)
+        yield misses[j], result
 
 
 def send_email(to_email, subject, body):
     """寄信函式。"""
-    from_email = st.secrets["EMAIL_ADDRESS"]
-    password = st.secrets["EMAIL_PASSWORD"]
-
-    msg = MIMEMultipart()
-    msg['From'] = from_email
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-    try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(from_email, password)
-        server.send_message(msg)
-        server.quit()
-        print("🔔 寄信成功！")
-    except Exception as e:
-        print(f"寄信失敗：{e}")
-        raise e
+    mailer = Mailer(MailConfig.from_env(st.secrets["EMAIL_ADDRESS"], st.secrets["EMAIL_PASSWORD"]))
+    _, failed = mailer.send_batch([OutgoingMail(to_email, subject, body)], include_outbox=False)
+    if failed:
+        print("寄信失敗：已存入寄件匣，下次排程執行時重寄。")
+        raise RuntimeError("郵件伺服器暫時無法寄出，已存入寄件匣，稍後會自動重寄")
+    print("🔔 寄信成功！")
 
 
 # 設定網頁的基礎架構、主標題、副標題。
@@ -45,6 +80,13 @@ st.markdown("<h4 style='text-align: center; font-size: 16px;'>推薦、計算、
 # 加入水平分隔線，分隔區塊。
 st.markdown("---")
 
+# 手動更新：清除快取，下次查詢會重新向網站取得資料。
+if st.sidebar.button("🔄 立即更新資料", key="refresh_cache"):
+    cached_recommendations.clear()
+    search_result_cache().invalidate()
+    invalidate_fruit_code()
+    st.sidebar.success("已清除快取，將重新取得最新資料。")
+
 # 2.設定主題故事段落。
 # 2-1.段落標題（置中對齊，<h4>字體大小約 16px）。
 st.markdown("<h4 style='text-align: center;'>一、主題故事</h4>", unsafe_allow_html=True)
@@ -107,7 +149,8 @@ with col1:
 # 按按鈕後執行第一週檔案中的 2.應用函式。
 if button_recommend:
     try:
-        df_veg, df_fruit = apply_url_dataframe()
+        # 快取保存數值資料，顯示前才轉成表格文字。
+        df_veg, df_fruit = map(format_price_dataframe, cached_recommendations())
 
         # 用 tabulate 美化。
         from tabulate import tabulate
@@ -242,26 +285,18 @@ if 'show_fruit_input' not in st.session_state:
 if button_dog:
     st.session_state.show_fruit_input = True
 
-def search_and_render_fruit_price(fruits: Sequence[str]) -> tuple[FruitSearchResult]:
-    """顯示果價的查詢結果與便宜通知。"""
-    search_results = tuple(map(lambda fruit: search(fruit), fruits))
-    
-    # 查詢成功。
-    for result in search_results:
-        if result.message == "success":
-            continue
+def render_fruit_result(placeholder, result: FruitSearchResult):
+    """在水果的位置顯示查詢結果（成功顯示果價，失敗顯示錯誤）。"""
+    with placeholder.container():
         # 查詢失敗。
-        st.error(f"{result.fruit} 查詢錯誤：{result.message}")
-        if result.errors:
-            st.error("詳細資訊:")
-            st.error("\n".join(result.errors))
-    
-    # 顯示查詢成功的果價結果。
-    success_results = tuple(filter(
-        lambda result: result.message == "success",
-        search_results,
-    ))
-    for result in success_results:
+        if result.message != "success":
+            st.error(f"{result.fruit} 查詢錯誤：{result.message}")
+            if result.errors:
+                st.error("詳細資訊:")
+                st.error("\n".join(result.errors))
+            return
+
+        # 查詢成功。
         fruit_info = result.data
         st.markdown((
             f"- **{result.fruit}**："
@@ -269,16 +304,37 @@ def search_and_render_fruit_price(fruits: Sequence[str]) -> tuple[FruitSearchRes
             f"成交價：{fruit_info.average_price} 元，"
             f"全年度平均成交價：{fruit_info.year_average_price} 元 "
         ))
-    
-    # 顯示便宜通知。
-    good_price_results = tuple(filter(
-        lambda result: result.data and result.data.lower_than_average,
-        success_results,
-    ))
-    for result in good_price_results:
-        st.success(f"🐶 汪！你喜歡的 {result.fruit} 最近便宜了汪，我幫你聞到了汪！")
 
-    return good_price_results
+
+def search_and_render_fruit_price(fruits: Sequence[str]) -> tuple[FruitSearchResult]:
+    """顯示果價的查詢結果與便宜通知：每種水果查完就顯示，不必等全部查完。"""
+    fruits = list(fruits)
+    if not fruits:
+        return tuple()
+
+    # 進度條與每種水果的位置（顯示順序與清單相同），查完的水果填入結果。
+    progress = st.progress(0.0, text=f"🐶 果價搜尋中…（0/{len(fruits)}）")
+    placeholders = [st.empty() for _ in fruits]
+    for placeholder, fruit in zip(placeholders, fruits):
+        placeholder.markdown(f"- **{fruit}**：查詢中…")
+    # 便宜通知顯示在所有水果下方，查到一種就加一則。
+    banners = st.container()
+
+    results = [None] * len(fruits)
+    for done, (i, result) in enumerate(iter_cached_search(fruits), start=1):
+        results[i] = result
+        render_fruit_result(placeholders[i], result)
+        if result.message == "success" and result.data.lower_than_average:
+            banners.success(f"🐶 汪！你喜歡的 {result.fruit} 最近便宜了汪，我幫你聞到了汪！")
+        progress.progress(done / len(fruits), text=f"🐶 果價搜尋中…（{done}/{len(fruits)}）")
+    progress.empty()
+
+    # 便宜的水果（依清單順序），用來寄信。
+    return tuple(
+        result
+        for result in results
+        if result.message == "success" and result.data.lower_than_average
+    )
 
 if st.session_state.show_fruit_input:
     # 顯示輸入畫面。
@@ -311,8 +367,8 @@ if st.session_state.show_fruit_input:
                 "email": email,
                 "fruits": fruits
             }
-            with open("fruit_list.json", "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # 新增或更新這位訂閱者的清單，不會覆蓋其他訂閱者。
+            upsert_subscriber(email, fruits)
             
             st.session_state.data = data
             st.success("🔔 喜愛水果清單儲存成功！")
@@ -323,7 +379,6 @@ if st.session_state.show_fruit_input:
         st.session_state.search_notify = True
     # 查詢。
     if st.session_state.get("search_notify", False):
-        st.markdown("🐶 果價搜尋中…")
 
         if not (data := st.session_state.get("data", None)):
             st.error("🐶 汪！要先儲存喜愛水果清單，才能查詢寄信！")
@@ -353,16 +408,15 @@ if st.session_state.show_fruit_input:
     # 顯示預覽畫面與功能。
     st.markdown("---")
     st.markdown("🍹 目前已儲存的喜愛水果清單")
-    fruit_file = Path("fruit_list.json")
-    if fruit_file.exists():
-        try:
-            with open(fruit_file, "r", encoding="utf-8") as f:
-                saved_data = json.load(f)
+    # 只顯示目前 Email 的清單，不顯示其他訂閱者的資料。
+    try:
+        if email_input.strip() and (subscriber := find_subscriber(email_input)):
+            saved_data = {"email": subscriber.email, "fruits": subscriber.fruits}
             st.code(json.dumps(saved_data, ensure_ascii=False, indent=2), language="json")
-        except Exception as e:
-            st.error(f"讀取失敗：{e}")
-    else:
-        st.info("🍹 尚未儲存任何清單")
+        else:
+            st.info("🍹 尚未儲存任何清單")
+    except Exception as e:
+        st.error(f"讀取失敗：{e}")
 
 # 4.設定頁尾段落。
 # 加入水平分隔線，分隔區塊。
@@ -1,11 +1,13 @@
 import os
 import logging
-import json # 用來處理 JSON 格式的資料，例如讀取與寫入設定檔。
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path # 提供物件導向的檔案與路徑處理方式。
-import smtplib # Python 的內建郵件傳送模組，用來透過 SMTP 協定發送 Email。
-from email.mime.text import MIMEText # 建立純文字格式的 email 內容物件。
-from email.mime.multipart import MIMEMultipart # 建立多格式的 email 內容物件。
-from veggie_w3 import search # 匯入第三週檔案中的 4.整合查詢函式。
+from veggie_w3 import search_many, get_fruit_code, fetch_latest_trade_day, FruitSearchException # 匯入第三週檔案中的批次查詢函式與最新交易週查詢。
+from veggie_mail import Mailer, MailConfig, OutgoingMail # 批次寄信與寄件匣。
+from veggie_subscriptions import load_subscribers, watched_fruits, build_rule_index # 多位訂閱者的喜愛水果清單與通知規則。
+from veggie_metrics import get_metrics # 各階段耗時與快取命中率。
+from veggie_cache import get_failure_cache # 查詢失敗負快取。
+from veggie_notify_state import load_notify_state, save_notify_state, subscribers_fingerprint # 上次處理的交易週與已通知紀錄。
 
 
 # logger 初始化函式：設定輸出檔案與終端機同時顯示。
@@ -21,72 +23,198 @@ def init_logger(log_file: str = "task_log.txt"):
     )
 
 
+# 寄信設定。
+FROM_EMAIL = ""                     # 改成你的寄件信箱。
+EMAIL_PASSWORD = ""                 # 改成你的信箱應用程式密碼。
+
+
+def get_mailer() -> Mailer:
+    """批次寄信元件：同一次執行共用一條 SMTP 連線，寄不出去的信存入寄件匣下次重寄。"""
+    return Mailer(MailConfig.from_env(FROM_EMAIL, EMAIL_PASSWORD))
+
+
 # 寄信函式。
 def send_email(to_email, subject, body):
-    from_email = ""                 # 改成你的寄件信箱。
-    password = ""                   # 改成你的信箱應用程式密碼。
-
-    msg = MIMEMultipart()
-    msg['From'] = from_email
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
+    _, failed = get_mailer().send_batch([OutgoingMail(to_email, subject, body)], include_outbox=False)
+    if failed:
+        logging.error("寄信失敗，已存入寄件匣，下次執行時重寄。")
+        raise RuntimeError(f"寄信給 {to_email} 失敗")
+    logging.info("🔔 寄信成功！")
+
+
+def format_notify_line(result, rules=()) -> str:
+    """便宜通知的信件內容（一種水果一段），rules 為觸發的通知規則。"""
+    line = (
+        f"🐶 汪！你喜歡的 {result.fruit} 最近便宜了汪，我幫你聞到了汪！\n"
+        f"（ 週期：{result.data.period}，成交價：{result.data.average_price} 元，全年度平均成交價：{result.data.year_average_price} 元 ）"
+    )
+    if reasons := "、".join(dict.fromkeys(rule.describe() for rule in rules)):
+        line += f"\n（ 通知條件：{reasons} ）"
+    return line
+
+
+def probe_latest_trade_day(fruits, max_workers: int = 8) -> str | None:
+    """
+    新鮮度檢查：水果代碼多半已在快取中，只需要一個「最新一筆週期」的小請求。
+    快取中沒有的代碼同時查詢（查到的代碼寫入快取，之後的批次查詢直接使用）。
+    查不到時回傳 None（視為需要完整執行）。
+    """
+    def lookup(fruit):
+        try:
+            return get_fruit_code(fruit)[0]
+        except FruitSearchException:
+            return None
+
+    if not fruits:
+        return None
+    # 執行緒數量不超過水果數量。
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(fruits)))) as executor:
+        codes = [code for code in executor.map(lookup, fruits) if code]
     try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(from_email, password)
-        server.send_message(msg)
-        server.quit()
-        logging.info("🔔 寄信成功！")
-    except Exception as e:
-        logging.error(f"寄信失敗：{e}")
-        raise e
+        return fetch_latest_trade_day(codes)
+    except FruitSearchException as e:
+        logging.warning(f"最新交易週查詢失敗，改為完整執行：{e.message}")
+        return None
 
 
 # 任務函式。
-def task():
+def task(force: bool = False):
+    # 每次執行重新統計，結束時寫入 metrics/runs.jsonl 與 metrics/veggie.prom。
+    metrics = get_metrics()
+    metrics.reset()
+    run = {"subscribers": 0, "fruits": 0, "mails_sent": 0, "mails_failed": 0, "skipped": False}
     try:
-        # 載入已儲存的喜愛水果清單。
+        with metrics.timer("task"):
+            _run_task(run, force)
+    finally:
+        try:
+            record = metrics.export(extra=run)
+            logging.info(f"⏱️ 各階段耗時：{record['stages']}")
+        except OSError as e:
+            logging.warning(f"效能指標寫入失敗：{e}")
+
+
+def _run_task(run: dict, force: bool = False):
+    try:
+        # 載入所有訂閱者的喜愛水果清單。
         base_dir = os.path.dirname(os.path.abspath(__file__))  # 加入絕對路徑 absolute path。
         fruit_file = Path(base_dir) / "fruit_list.json"
-        if not fruit_file.exists():
+        if not (subscribers := load_subscribers(fruit_file)):
             logging.warning("沒有喜愛水果清單，故無法執行。")
             return
-        
-        with open(fruit_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        # 查詢。
-        logging.info(f"👉 準備處理 {data.get('email')}，水果清單：{data.get('fruits')}")
-        notify_list = []
-        
-        for fruit in data.get('fruits', []):
-            try:
-                result = search(fruit)
-                logging.info(f"🔍 查詢結果：{result}")
-
-                if result.data and result.data.lower_than_average:
-                    line = (
-                        f"🐶 汪！你喜歡的 {result.fruit} 最近便宜了汪，我幫你聞到了汪！\n"
-                        f"（ 週期：{result.data.period}，成交價：{result.data.average_price} 元，全年度平均成交價：{result.data.year_average_price} 元 ）"
-                    )
-                    notify_list.append(line)
-            except Exception as e:
-                logging.warning(f"{fruit} 查詢錯誤：{e}", exc_info=True)
-        
-        # 寄信通知。
-        if notify_list:
-            body = "\n".join(notify_list)
-            send_email(data['email'], "🐶 果價汪汪", body)
-            logging.info(f"🔔 每週通知已寄給 {data['email']}！")
-        else:
-            logging.info("🐶 沒有水果價格低於平均，暫不寄信汪～")
+
+        # 所有訂閱者關注的水果聯集：每種水果只查詢一次。
+        fruits = watched_fruits(subscribers)
+        run.update(subscribers=len(subscribers), fruits=len(fruits))
+        logging.info(f"👉 準備處理 {len(subscribers)} 位訂閱者，共 {len(fruits)} 種水果：{fruits}")
+
+        # 交易資料每週才更新一次：最新交易週與訂閱清單都沒變時，不必再查詢與比對。
+        state = load_notify_state()
+        fingerprint = subscribers_fingerprint(subscribers)
+        # 強制執行時不看新鮮度檢查的結果，也就不必詢問。
+        trade_day = None
+        if not force:
+            with get_metrics().timer("freshness"):
+                trade_day = probe_latest_trade_day(fruits)
+        if not force and state.is_fresh(trade_day, fingerprint):
+            logging.info(f"😴 最新交易週仍是 {trade_day}，訂閱清單也沒有變動，略過這次查詢。")
+            run.update(skipped=True)
+            # 寄件匣裡上次寄不出去的信還是要重寄。
+            sent, failed = get_mailer().retry_outbox()
+            run.update(mails_sent=len(sent), mails_failed=len(failed))
+            return
+
+        # 同時查詢所有水果，單一水果的錯誤會保留在各自的查詢結果中。
+        results = {}
+        for result in search_many(fruits):
+            logging.info(f"🔍 查詢結果：{result}")
+            if result.message != "success":
+                logging.warning(f"{result.fruit} 查詢錯誤：{result.message}")
+            results[result.fruit] = result
+
+        # 用規則索引找出每種水果觸發的規則，再依訂閱者分組。
+        rule_index = build_rule_index(subscribers)
+        triggered = {}
+        for fruit, result in results.items():
+            if not result.data:
+                continue
+            for rule in rule_index.evaluate(
+                fruit,
+                result.data.average_price,
+                year_average_price=result.data.year_average_price,
+                streak=result.data.low_streak_weeks,
+            ):
+                triggered.setdefault(rule.email, {}).setdefault(fruit, []).append(rule)
+
+        # 依訂閱者整理通知信（同一週期已通知過的水果不再通知）。
+        mails, mail_fruits = [], {}
+        for subscriber in subscribers:
+            fruits_to_notify = {
+                fruit: rules
+                for fruit, rules in triggered.get(subscriber.email, {}).items()
+                if not state.already_notified(subscriber.email, fruit, results[fruit].data.period)
+            }
+
+            if not fruits_to_notify:
+                logging.info(f"🐶 {subscriber.email} 沒有新的水果符合通知條件，暫不寄信汪～")
+                continue
+            mail = OutgoingMail(
+                subscriber.email,
+                "🐶 果價汪汪",
+                "\n".join(format_notify_line(results[fruit], rules) for fruit, rules in fruits_to_notify.items()),
+            )
+            mails.append(mail)
+            mail_fruits[mail.mail_id] = list(fruits_to_notify)
+
+        # 寄信通知：先重寄寄件匣裡上次失敗的信，再以同一條連線寄出這次的信。
+        sent, failed = get_mailer().send_batch(mails)
+        run.update(mails_sent=len(sent), mails_failed=len(failed))
+        for mail in sent:
+            logging.info(f"🔔 每週通知已寄給 {mail.to_email}！")
+        for mail in failed:
+            # 單一訂閱者寄信失敗不影響其他訂閱者。
+            logging.warning(f"寄信給 {mail.to_email} 失敗（第 {mail.attempts} 次），已存入寄件匣。")
+
+        # 記錄已通知的水果（寄不出去的信在寄件匣裡會自動重寄，也算已通知），以及這次處理的交易週。
+        for mail in sent + failed:
+            for fruit in mail_fruits.get(mail.mail_id, ()):
+                state.mark_notified(mail.to_email, fruit, results[fruit].data.period)
+        periods = [result.data.period for result in results.values() if result.data]
+        # 有水果因連線問題查詢失敗時不記錄交易週，下次執行會再完整查詢一次（找不到等錯誤已記在失敗負快取，不必重查）。
+        retry = [fruit for fruit, result in results.items() if not result.data and not get_failure_cache().get(fruit)]
+        state.last_trade_day = None if retry else (trade_day or max(periods, default=None))
+        state.subscribers_fingerprint = fingerprint
+        state.prune(subscribers)
+        save_notify_state(state)
 
     except Exception as e:
         logging.exception(f"任務函式錯誤：{e}")
 
-if __name__ == "__main__":
+def main():
+    import argparse
+    from functools import partial
+    from veggie_daemon import daemon_options_from_env, run_daemon, run_locked
+
+    options = daemon_options_from_env()
+    parser = argparse.ArgumentParser(description="果價汪汪：自動寄信通知。")
+    parser.add_argument("--daemon", action="store_true", help="常駐執行，依 cron 排程定時執行（Linux）")
+    parser.add_argument("--cron", default=options["cron"], help="cron 排程（分 時 日 月 星期），預設每週一 9:00")
+    parser.add_argument("--jitter", type=float, default=options["jitter"], help="每次隨機延後的最多秒數")
+    parser.add_argument("--run-now", action="store_true", help="常駐啟動後先執行一次")
+    parser.add_argument("--force", action="store_true", help="即使沒有新的交易週也完整執行（同一週期仍不重複通知）")
+    args = parser.parse_args()
+
     init_logger()
     logging.info("🟢 程式開始執行")
-    task()
+    job = partial(task, force=args.force)
+    if args.daemon:
+        import asyncio
+        asyncio.run(run_daemon(job, args.cron, args.jitter, options["lock_path"], run_now=args.run_now))
+    else:
+        # 單次執行也使用同一個檔案鎖，不會與常駐排程重疊。
+        run_locked(job, options["lock_path"])
     logging.info("✅ 程式執行完成")
+
+
+if __name__ == "__main__":
+    main()